@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -29,11 +30,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'theschool.metrics_utils.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'theschool.replica_utils.PrimaryPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -57,10 +60,63 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'SMS_CLEAN.wsgi.application'
 
+# SQLite production profile. Every new connection runs these pragmas:
+# WAL lets dashboard reads proceed while a register is being saved, and
+# synchronous=NORMAL only fsyncs at checkpoints (durable across crashes of
+# the app, not of the OS). cache_size is in KiB when negative.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'cache_size': -20000,
+    'mmap_size': 128 * 1024 * 1024,
+    'temp_store': 'memory',
+    'journal_size_limit': 64 * 1024 * 1024,
+}
+
+
+def sqlite_database(path, **overrides):
+    """
+    Connection settings for a SQLite file under the production profile:
+    writers wait up to 20 s for the lock instead of failing with "database
+    is locked", transactions start with BEGIN IMMEDIATE so a read-then-write
+    block never has to upgrade its lock mid-way, and connections are kept
+    for CONN_MAX_AGE seconds rather than reopened per request.
+    """
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+        },
+        **overrides,
+    }
+
+
 DATABASES = {
+    'default': sqlite_database(BASE_DIR / 'db.sqlite3'),
+}
+
+# Optional reporting replica: set ANALYTICS_DB to a second SQLite file and
+# keep it current with `manage.py refresh_analytics_replica`. Reporting
+# views fall back to the primary when it is older than ANALYTICS_MAX_LAG
+# seconds (see theschool.replica_utils).
+if os.environ.get('ANALYTICS_DB'):
+    DATABASES['analytics'] = sqlite_database(os.environ['ANALYTICS_DB'])
+DATABASE_ROUTERS = ['theschool.replica_utils.AnalyticsRouter']
+ANALYTICS_MAX_LAG = 300
+
+# File-based so every worker process shares one cache without running a
+# cache server. Per-school values are versioned (theschool.cache_utils).
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR', BASE_DIR / 'cache'),
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
     }
 }
 
@@ -72,6 +128,17 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Bundled, minified, fingerprinted and precompressed CSS. Build with
+# `STATIC_PIPELINE=1 python manage.py collectstatic --noinput`, then run with
+# STATIC_PIPELINE=1 (and `runserver --nostatic` in development).
+STATIC_PIPELINE = os.environ.get('STATIC_PIPELINE') == '1'
+if STATIC_PIPELINE:
+    STORAGES = {
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'theschool.static_pipeline.PipelineStaticStorage'},
+    }
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -80,3 +147,21 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_REDIRECT_URL = '/dashboard/'
 LOGOUT_REDIRECT_URL = '/login/'
+
+# SMS outbox: views queue messages, `manage.py send_outbox` delivers them.
+# Swap in a gateway backend here; FileSMSBackend writes to SMS_FILE_PATH.
+SMS_BACKEND = 'theschool.sms_backends.ConsoleSMSBackend'
+SMS_FILE_PATH = BASE_DIR / 'sms_outbox.log'
+
+# Request metrics (theschool.metrics_utils), served at /metrics. Requests over
+# a budget, or running one statement REPEATED_QUERY_THRESHOLD times, are logged.
+# Scrapers authenticate with `Authorization: Bearer $METRICS_TOKEN`. Allowing
+# addresses is opt-in (METRICS_ALLOWED_IPS=10.0.0.5,10.0.0.6) and only safe
+# when REMOTE_ADDR is the client's: behind a local reverse proxy every request
+# comes from 127.0.0.1.
+METRICS_DIR = Path(os.environ.get('METRICS_DIR', BASE_DIR / 'metrics'))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = [ip.strip() for ip in os.environ.get('METRICS_ALLOWED_IPS', '').split(',') if ip.strip()]
+REQUEST_QUERY_BUDGET = 50
+REQUEST_TIME_BUDGET = 1.0
+REPEATED_QUERY_THRESHOLD = 5
@@ -15,7 +15,7 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 
@@ -24,5 +24,10 @@ urlpatterns = [
     path('', include('theschool.urls')),  # ✅ Connects your app
 ]
 
+if settings.STATIC_PIPELINE:
+    from theschool.static_pipeline import serve_static
+
+    urlpatterns += [re_path(r'^static/(?P<path>.*)$', serve_static)]
+
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
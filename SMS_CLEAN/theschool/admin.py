@@ -1,8 +1,9 @@
 from django.contrib import admin
 from .models import (
     School, User, Stream, Student, ParentDetails, GuardianDetails,
-    Attendance, FeeRecord, LessonPlan, PlatformConfig,
-    Teacher, SupportStaff
+    Attendance, AttendanceDailySummary, FeeRecord, LessonPlan, PlatformConfig,
+    Teacher, SupportStaff, IdSequence, StudentFeeBalance, SchoolFeeTotal,
+    OutboundMessage, MessageCampaign, StoredFile
 )
 
 admin.site.register(School)
@@ -12,8 +13,15 @@ admin.site.register(Student)
 admin.site.register(ParentDetails)
 admin.site.register(GuardianDetails)
 admin.site.register(Attendance)
+admin.site.register(AttendanceDailySummary)
 admin.site.register(FeeRecord)
 admin.site.register(LessonPlan)
 admin.site.register(PlatformConfig)
 admin.site.register(Teacher)
-admin.site.register(SupportStaff)
\ No newline at end of file
+admin.site.register(SupportStaff)
+admin.site.register(IdSequence)
+admin.site.register(StudentFeeBalance)
+admin.site.register(SchoolFeeTotal)
+admin.site.register(OutboundMessage)
+admin.site.register(MessageCampaign)
+admin.site.register(StoredFile)
@@ -0,0 +1,142 @@
+# theschool/attendance_utils.py
+from collections import defaultdict
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+
+from .cache_utils import bump_school_version
+from .models import Attendance, AttendanceDailySummary, School, Student
+
+
+def apply_attendance_delta(school_id, stream_id, day, present=0, total=0):
+    """
+    Add `present`/`total` to the rollup row for (school, stream, day).
+    Negative-only deltas never create rows: there is nothing to take away from.
+    """
+    if not present and not total:
+        return
+    rows = AttendanceDailySummary.objects.filter(school_id=school_id, stream_id=stream_id, date=day)
+    with transaction.atomic():
+        updated = rows.update(present=F('present') + present, total=F('total') + total)
+        if updated or (present <= 0 and total <= 0):
+            return
+        try:
+            with transaction.atomic():
+                AttendanceDailySummary.objects.create(
+                    school_id=school_id, stream_id=stream_id, date=day,
+                    present=present, total=total,
+                )
+        except IntegrityError:
+            # Someone else created the row between our UPDATE and INSERT.
+            rows.update(present=F('present') + present, total=F('total') + total)
+
+
+def apply_attendance_deltas(deltas):
+    """Apply a {(school_id, stream_id, day): [present, total]} mapping in one transaction."""
+    with transaction.atomic():
+        for (school_id, stream_id, day), (present, total) in deltas.items():
+            apply_attendance_delta(school_id, stream_id, day, present, total)
+
+
+def student_attendance_by_day(student_id):
+    """[(date, present, total)] for one student, used when a student leaves or moves stream."""
+    return (
+        Attendance.objects.filter(student_id=student_id)
+        .order_by()
+        .values('date')
+        .annotate(total=Count('pk'), present=Count('pk', filter=Q(status='Present')))
+        .values_list('date', 'present', 'total')
+    )
+
+
+def move_student_attendance(student_id, old_key, new_key):
+    """Shift a student's history from one (school_id, stream_id) bucket to another."""
+    deltas = defaultdict(lambda: [0, 0])
+    for day, present, total in student_attendance_by_day(student_id):
+        if old_key is not None:
+            deltas[(*old_key, day)][0] -= present
+            deltas[(*old_key, day)][1] -= total
+        if new_key is not None:
+            deltas[(*new_key, day)][0] += present
+            deltas[(*new_key, day)][1] += total
+    apply_attendance_deltas(deltas)
+
+
+def save_register(school, day, statuses, stream=None):
+    """
+    Upsert a whole class register in one transaction.
+
+    `statuses` maps student id -> 'Present' / 'Absent'. Ids outside the
+    school (or `stream`, when given) are ignored. Resubmitting a register for
+    the same day corrects statuses in place thanks to the unique
+    (student, date) constraint. Returns the number of rows written.
+    """
+    roster = Student.objects.filter(school=school, pk__in=list(statuses))
+    if stream is not None:
+        roster = roster.filter(stream=stream)
+    streams = dict(roster.values_list('pk', 'stream_id'))
+    if not streams:
+        return 0
+
+    with transaction.atomic():
+        previous = dict(
+            Attendance.objects.filter(student_id__in=list(streams), date=day)
+            .values_list('student_id', 'status')
+        )
+        Attendance.objects.bulk_create(
+            [Attendance(student_id=pk, date=day, status=statuses[pk]) for pk in streams],
+            update_conflicts=True,
+            unique_fields=['student', 'date'],
+            update_fields=['status'],
+        )
+
+        deltas = defaultdict(lambda: [0, 0])
+        for pk, stream_id in streams.items():
+            delta = deltas[(school.pk, stream_id, day)]
+            delta[0] += int(statuses[pk] == 'Present')
+            delta[1] += 1
+            if pk in previous:
+                delta[0] -= int(previous[pk] == 'Present')
+                delta[1] -= 1
+        apply_attendance_deltas(deltas)
+        bump_school_version(school.pk)  # bulk_create sends no post_save
+    return len(streams)
+
+
+def rebuild_attendance_summary(school_id=None):
+    """
+    Recompute the rollup from raw Attendance rows. Returns the number of
+    summary rows written. Pass `school_id` to limit the rebuild to one school.
+    """
+    raw = Attendance.objects.all()
+    summaries = AttendanceDailySummary.objects.all()
+    if school_id is not None:
+        raw = raw.filter(student__school_id=school_id)
+        summaries = summaries.filter(school_id=school_id)
+
+    grouped = (
+        raw.order_by()
+        .values('student__school_id', 'student__stream_id', 'date')
+        .annotate(total=Count('pk'), present=Count('pk', filter=Q(status='Present')))
+    )
+    with transaction.atomic():
+        summaries.delete()
+        rows = (
+            AttendanceDailySummary(
+                school_id=row['student__school_id'],
+                stream_id=row['student__stream_id'],
+                date=row['date'],
+                present=row['present'],
+                total=row['total'],
+            )
+            for row in grouped.iterator(chunk_size=2000)
+        )
+        written = 0
+        while batch := list(islice(rows, 500)):
+            AttendanceDailySummary.objects.bulk_create(batch)
+            written += len(batch)
+        school_ids = [school_id] if school_id is not None else School.objects.values_list('pk', flat=True)
+        for pk in school_ids:
+            bump_school_version(pk)
+    return written
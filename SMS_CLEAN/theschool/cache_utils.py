@@ -0,0 +1,69 @@
+# theschool/cache_utils.py
+"""
+Per-school cache namespace.
+
+Each school has a version token in the cache. Cached values are keyed by
+(school, token, name), and any write to the school's students, staff,
+streams, attendance or fees swaps in a fresh token (bump_school_version).
+Entries for an old token are never read again and expire on their TTL.
+That is why readers never see numbers from before a write.
+
+Tokens are random rather than counters, so if the version key is evicted,
+the new token cannot collide with entries written under an older one.
+The backend is settings.CACHES['default'], a file-based cache that every
+worker process shares.
+"""
+import uuid
+from functools import partial
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from .replica_utils import read_from
+
+DEFAULT_TTL = 300
+_MISSING = object()
+
+
+def _version_key(school_id):
+    return f"school:{school_id}:version"
+
+
+def school_version(school_id):
+    """The school's current version token, creating one on first use."""
+    key = _version_key(school_id)
+    token = cache.get(key)
+    if token is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        token = cache.get(key)  # another worker may have added its token first
+    return token
+
+
+def _replace_version(school_id):
+    cache.set(_version_key(school_id), uuid.uuid4().hex, None)
+
+
+def bump_school_version(school_id):
+    """Retire everything cached for the school, now and again once the current transaction commits."""
+    if school_id is None:
+        return
+    _replace_version(school_id)
+    # A reader between this write and the commit may have cached the old
+    # numbers under the token we just issued.
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(partial(_replace_version, school_id))
+
+
+def cached_for_school(school_id, name, compute, timeout=DEFAULT_TTL):
+    """
+    Return compute() for the school's current version, computing it once per
+    version. compute() always reads the primary database, so a lagging
+    replica cannot be cached under a fresh token.
+    """
+    key = f"school:{school_id}:{school_version(school_id)}:{name}"
+    value = cache.get(key, _MISSING)
+    if value is _MISSING:
+        with read_from(DEFAULT_DB_ALIAS):
+            value = compute()
+        cache.set(key, value, timeout)
+    return value
@@ -0,0 +1,176 @@
+# theschool/campaign_utils.py
+import string
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Value
+from django.db.models.functions import Coalesce, NullIf
+from django.utils import timezone
+
+from .models import Attendance, MessageCampaign, OutboundMessage, Student
+
+BATCH_SIZE = 500
+PLACEHOLDERS = ('student', 'first_name', 'registration_number', 'school', 'due', 'paid', 'balance')
+DEFAULT_TEMPLATES = {
+    'fee_reminder': (
+        "Dear parent, {student} ({registration_number}) has an outstanding fee "
+        "balance of KES {balance} at {school}. Kindly clear it at your earliest convenience."
+    ),
+    'attendance_reminder': (
+        "Dear parent, {student} missed school this week at {school}. "
+        "Please contact the school if there is a problem."
+    ),
+    'all_parents': "Dear parent, ",
+}
+
+
+def _absent_this_week():
+    since = timezone.localdate() - timedelta(days=6)
+    return Exists(Attendance.objects.filter(student=OuterRef('pk'), status='Absent', date__gte=since))
+
+
+# audience -> filter on Student
+AUDIENCES = {
+    'fee_reminder': lambda: Q(fee_balance__total_due__gt=F('fee_balance__total_paid')),
+    'attendance_reminder': lambda: Q(_absent_this_week()),
+    'all_parents': lambda: Q(),
+}
+
+
+def recipients(school, audience):
+    """
+    Students in the audience that have a contact number, as one query. The
+    number is the parent account's phone, else the mother's, father's or
+    guardian's from the admission form.
+    """
+    students = Student.objects.all() if school is None else Student.objects.filter(school=school)
+    phone = Coalesce(
+        NullIf('parent__phone_number', Value('')),
+        NullIf('parentdetails__mother_phone', Value('')),
+        NullIf('parentdetails__father_phone', Value('')),
+        NullIf('guardiandetails__phone', Value('')),
+    )
+    return students.filter(AUDIENCES[audience]()).annotate(phone=phone).filter(phone__isnull=False)
+
+
+def validate_template(template):
+    """Raise ValueError unless every {placeholder} in `template` is one we can fill."""
+    if not template.strip():
+        raise ValueError("The message is empty.")
+    try:
+        fields = [name for _, name, _, _ in string.Formatter().parse(template) if name is not None]
+    except ValueError as exc:
+        raise ValueError(f"Invalid message template: {exc}.")
+    for name in fields:
+        if name not in PLACEHOLDERS:
+            raise ValueError(
+                f"Unknown placeholder {{{name}}}; use any of "
+                + ", ".join(f"{{{p}}}" for p in PLACEHOLDERS) + "."
+            )
+
+
+def create_campaign(school, audience, template, created_by=None, rate_per_minute=600):
+    """Validate and queue a campaign. Recipients are expanded later by the outbox worker."""
+    if audience not in AUDIENCES:
+        raise ValueError(f"Unknown audience '{audience}'.")
+    validate_template(template)
+    if rate_per_minute < 1:
+        raise ValueError("The send rate must be at least one message a minute.")
+    return MessageCampaign.objects.create(
+        school=school,
+        created_by=created_by,
+        audience=audience,
+        template=template,
+        rate_per_minute=rate_per_minute,
+        total=recipients(school, audience).count(),
+    )
+
+
+def expand_campaign(campaign, batch_size=BATCH_SIZE):
+    """
+    Render the next `batch_size` recipients into outbox rows in one short
+    transaction and advance the campaign's cursor. Each message is scheduled
+    at the campaign's rate, so the worker spreads a large campaign out
+    instead of sending it all at once. Returns the number of messages queued.
+    """
+    rows = list(
+        recipients(campaign.school, campaign.audience)
+        .filter(pk__gt=campaign.last_student_id)
+        .order_by('pk')
+        .values_list(
+            'pk', 'first_name', 'last_name', 'registration_number', 'school_id', 'school__name',
+            'fee_balance__total_due', 'fee_balance__total_paid', 'phone',
+        )[:batch_size]
+    )
+
+    now = timezone.now()
+    interval = 60.0 / campaign.rate_per_minute
+    messages = []
+    for offset, (pk, first, last, reg_no, school_id, school_name, due, paid, phone) in enumerate(rows):
+        due, paid = due or 0, paid or 0
+        body = campaign.template.format(
+            student=f"{first} {last}",
+            first_name=first,
+            registration_number=reg_no,
+            school=school_name,
+            due=due,
+            paid=paid,
+            balance=due - paid,
+        )
+        send_at = campaign.created_at + timedelta(seconds=(campaign.queued + offset) * interval)
+        messages.append(OutboundMessage(
+            school_id=school_id,
+            campaign=campaign,
+            phone_number=phone,
+            body=body,
+            next_attempt_at=max(send_at, now),
+        ))
+
+    finished = len(rows) < batch_size
+    changes = {'queued': F('queued') + len(rows), 'status': MessageCampaign.RUNNING}
+    if rows:
+        changes['last_student_id'] = rows[-1][0]
+    if finished:
+        changes.update(status=MessageCampaign.DONE, finished_at=now)
+
+    with transaction.atomic():
+        # Guarded by status so a campaign cancelled meanwhile queues nothing, and
+        # by the cursor the rows were read from so that when two workers read the
+        # same batch, only the first to move the cursor queues it.
+        claimed = MessageCampaign.objects.filter(
+            pk=campaign.pk,
+            status__in=[MessageCampaign.QUEUED, MessageCampaign.RUNNING],
+            last_student_id=campaign.last_student_id,
+        ).update(**changes)
+        if claimed:
+            OutboundMessage.objects.bulk_create(messages, batch_size=BATCH_SIZE)
+
+    campaign.refresh_from_db(fields=['queued', 'status', 'last_student_id', 'finished_at'])
+    return len(messages) if claimed else 0
+
+
+def expand_campaigns(batch_size=BATCH_SIZE):
+    """Queue one batch from every active campaign. Returns the number of messages queued."""
+    active = MessageCampaign.objects.filter(
+        status__in=[MessageCampaign.QUEUED, MessageCampaign.RUNNING]
+    ).order_by('created_at')
+    return sum(expand_campaign(campaign, batch_size) for campaign in active)
+
+
+def cancel_campaign(campaign):
+    """Stop a campaign; messages it queued that have not gone out yet are dropped."""
+    with transaction.atomic():
+        MessageCampaign.objects.filter(
+            pk=campaign.pk, status__in=[MessageCampaign.QUEUED, MessageCampaign.RUNNING]
+        ).update(status=MessageCampaign.CANCELLED, finished_at=timezone.now())
+        OutboundMessage.objects.filter(campaign=campaign, status=OutboundMessage.PENDING).update(
+            status=OutboundMessage.FAILED, last_error='Campaign cancelled'
+        )
+
+
+def with_progress(campaigns):
+    """Annotate campaigns with sent and failed message counts."""
+    return campaigns.annotate(
+        sent=Count('outboundmessage', filter=Q(outboundmessage__status=OutboundMessage.SENT)),
+        failed=Count('outboundmessage', filter=Q(outboundmessage__status=OutboundMessage.FAILED)),
+    )
@@ -1,58 +1,83 @@
 # theschool/chatbot_utils.py
-from django.db.models import Sum
-from .models import Student, FeeRecord, Teacher
+import re
+
+from .models import Student
+from .stats_utils import school_stats_snapshot
+
+HELP = "I can answer: 'total students', 'total teachers', 'attendance', 'fees', or 'balance <REG_NO>'."
+
+
+def _students(match, user):
+    return f"There are {school_stats_snapshot(user.school)['total_students']} students registered."
+
+
+def _teachers(match, user):
+    return f"There are {school_stats_snapshot(user.school)['total_teachers']} teachers."
+
+
+def _attendance(match, user):
+    return f"Weekly attendance average is {school_stats_snapshot(user.school)['weekly_attendance_avg']:.1f}%."
+
+
+def _fees(match, user):
+    return f"Fee collection so far is {school_stats_snapshot(user.school)['fee_compliance']:.1f}%."
+
+
+def _balance(match, user):
+    reg_no = match.group("reg_no")
+    if not reg_no:
+        return "Please provide a registration number, e.g. 'balance AB0010001'."
+
+    # Registration numbers are issued in upper case, so an exact match on the
+    # normalised input hits the unique index directly.
+    student = (
+        Student.objects.filter(school=user.school, registration_number=reg_no.upper())
+        .select_related("fee_balance")
+        .only(
+            "first_name", "last_name", "registration_number",
+            "fee_balance__total_due", "fee_balance__total_paid",
+        )
+        .first()
+    )
+    if student is None:
+        return "Student not found. Please check the registration number."
+    try:
+        ledger = student.fee_balance
+    except Student.fee_balance.RelatedObjectDoesNotExist:
+        return f"{student} ({student.registration_number}) has no fee records yet."
+    return (
+        f"{student} ({student.registration_number}) has paid KES {ledger.total_paid:.2f} "
+        f"of KES {ledger.total_due:.2f}; balance KES {ledger.balance:.2f}."
+    )
+
+
+# (pattern, handler) in priority order; the first pattern that matches answers.
+INTENTS = [
+    (re.compile(r"^balance\b(?:\s+(?P<reg_no>\S+))?"), _balance),
+    (re.compile(r"\b(?:total|how many|number of)\s+students?\b"), _students),
+    (re.compile(r"\b(?:total|how many|number of)\s+teachers?\b"), _teachers),
+    (re.compile(r"\battendance\b"), _attendance),
+    (re.compile(r"\b(?:fees?|collection)\b"), _fees),
+]
+
 
 def get_chatbot_reply(message: str, user) -> str:
     """
     Simple admin chatbot responder. Supports:
       - "total students" / "how many students"
       - "total teachers"
-      - "balance <ADM_NO>"
-      - "attendance"  (returns weekly average if available)
-    Falls back to a friendly help message.
+      - "balance <REG_NO>"
+      - "attendance"  (weekly average)
+      - "fees"  (collection rate)
+    Counts come from the school's cached stats snapshot, so most replies run
+    no queries at all. Falls back to a friendly help message.
     """
-    msg = (message or "").lower().strip()
+    if user.school is None:
+        return "The chatbot answers questions about your school; this account is not linked to one."
 
-    # totals
-    if "total students" in msg or "how many students" in msg:
-        try:
-            # if your Student model has a school FK, filter by user.school
-            count = Student.objects.filter(school=user.school).count()
-        except Exception:
-            count = Student.objects.count()
-        return f"There are {count} students registered."
-
-    if "total teachers" in msg or "how many teachers" in msg:
-        try:
-            count = Teacher.objects.filter(school=user.school).count()
-        except Exception:
-            count = Teacher.objects.count()
-        return f"There are {count} teachers."
-
-    # balance by admission number: "balance ADM123"
-    if msg.startswith("balance"):
-        parts = msg.split()
-        if len(parts) >= 2:
-            adm = parts[1].strip()
-            try:
-                s = Student.objects.get(admission_no__iexact=adm)
-            except Student.DoesNotExist:
-                return "Student not found. Please check the admission number."
-            paid = FeeRecord.objects.filter(student=s).aggregate(total=Sum('amount'))['total'] or 0
-            return f"{s.name} (ADM: {s.admission_no}) has paid KES {paid:.2f} so far."
-        else:
-            return "Please provide an admission number, e.g. 'balance ADM123'."
-
-    # attendance quick answer — try to use Attendance model or precomputed stat
-    if "attendance" in msg:
-        # attempt to import a simple helper to compute weekly attendance, otherwise fallback
-        try:
-            from .stats_utils import weekly_attendance_for_school
-            stats = weekly_attendance_for_school(user.school)
-            wa = stats.get("weekly_attendance_avg", 0)
-            return f"Weekly attendance average is {wa:.1f}%."
-        except Exception:
-            return "Attendance data not available via the chatbot right now."
-
-    # default
-    return "I can answer: 'total students', 'total teachers', 'attendance', or 'balance <ADM_NO>'."
+    msg = (message or "").lower().strip()
+    for pattern, handler in INTENTS:
+        match = pattern.search(msg)
+        if match:
+            return handler(match, user)
+    return HELP
@@ -0,0 +1,116 @@
+# theschool/export_utils.py
+import csv
+import json
+
+from django.utils.dateparse import parse_date
+
+from .models import Attendance, FeeRecord, Student
+
+CHUNK_SIZE = 2000
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+# dataset -> (queryset builder, date field used for the range or None, [(header, lookup), ...])
+EXPORTS = {
+    'students': (
+        lambda school: Student.objects.filter(school=school),
+        None,
+        [
+            ('registration_number', 'registration_number'),
+            ('first_name', 'first_name'),
+            ('last_name', 'last_name'),
+            ('date_of_birth', 'date_of_birth'),
+            ('gender', 'gender'),
+            ('religion', 'religion'),
+            ('grade', 'grade'),
+            ('stream', 'stream__name'),
+            ('father_name', 'parentdetails__father_name'),
+            ('father_phone', 'parentdetails__father_phone'),
+            ('mother_name', 'parentdetails__mother_name'),
+            ('mother_phone', 'parentdetails__mother_phone'),
+            ('guardian_name', 'guardiandetails__full_name'),
+            ('guardian_phone', 'guardiandetails__phone'),
+        ],
+    ),
+    'attendance': (
+        lambda school: Attendance.objects.filter(student__school=school),
+        'date',
+        [
+            ('registration_number', 'student__registration_number'),
+            ('first_name', 'student__first_name'),
+            ('last_name', 'student__last_name'),
+            ('stream', 'student__stream__name'),
+            ('date', 'date'),
+            ('status', 'status'),
+        ],
+    ),
+    'fees': (
+        lambda school: FeeRecord.objects.filter(student__school=school),
+        'paid_on',
+        [
+            ('registration_number', 'student__registration_number'),
+            ('first_name', 'student__first_name'),
+            ('last_name', 'student__last_name'),
+            ('term', 'term'),
+            ('amount_due', 'amount_due'),
+            ('amount_paid', 'amount_paid'),
+            ('paid_on', 'paid_on'),
+        ],
+    ),
+}
+
+
+class _Echo:
+    """File-like object whose write() hands the line straight back to csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(dataset, school, start=None, end=None, using=None):
+    """Raw value tuples for an export, fetched in chunks without building model instances."""
+    build, date_field, columns = EXPORTS[dataset]
+    queryset = build(school).using(using)
+    if date_field and start:
+        queryset = queryset.filter(**{f'{date_field}__gte': start})
+    if date_field and end:
+        queryset = queryset.filter(**{f'{date_field}__lte': end})
+    lookups = [lookup for _, lookup in columns]
+    return queryset.order_by('pk').values_list(*lookups).iterator(chunk_size=CHUNK_SIZE)
+
+
+def _lines(dataset, rows, fmt):
+    headers = [header for header, _ in EXPORTS[dataset][2]]
+    if fmt == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(headers)
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        for row in rows:
+            yield json.dumps(dict(zip(headers, row)), default=str) + '\n'
+
+
+def parse_bound(value, name):
+    """A start/end date from user input; None when empty, ValueError when it is not YYYY-MM-DD."""
+    if not value:
+        return None
+    day = parse_date(value)  # None for the wrong shape, ValueError for e.g. 2024-02-30
+    if day is None:
+        raise ValueError(f"Invalid {name} date '{value}'; use YYYY-MM-DD.")
+    return day
+
+
+def stream_export(dataset, school, start=None, end=None, fmt='csv', using=None):
+    """
+    Return an iterator over the export's lines (header first for CSV), read
+    from the `using` database alias. Arguments are checked up front so
+    callers can report bad input before streaming.
+    """
+    if dataset not in EXPORTS:
+        raise ValueError(f"Unknown export '{dataset}'.")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}'.")
+    return _lines(dataset, export_rows(dataset, school, start, end, using), fmt)
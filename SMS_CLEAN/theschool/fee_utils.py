@@ -0,0 +1,141 @@
+# theschool/fee_utils.py
+from decimal import Decimal
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+
+from .cache_utils import bump_school_version
+from .models import FeeRecord, School, SchoolFeeTotal, StudentFeeBalance
+
+ZERO = Decimal('0')
+
+
+def _apply(rows, create, due, paid):
+    """Add (due, paid) to the row(s) in `rows`, creating it when the delta adds money."""
+    if not due and not paid:
+        return
+    with transaction.atomic():
+        updated = rows.update(total_due=F('total_due') + due, total_paid=F('total_paid') + paid)
+        if updated or (due <= 0 and paid <= 0):
+            return
+        try:
+            with transaction.atomic():
+                create(total_due=due, total_paid=paid)
+        except IntegrityError:
+            rows.update(total_due=F('total_due') + due, total_paid=F('total_paid') + paid)
+
+
+def _apply_school(school_id, term, due, paid):
+    _apply(
+        SchoolFeeTotal.objects.filter(school_id=school_id, term=term),
+        lambda **totals: SchoolFeeTotal.objects.create(school_id=school_id, term=term, **totals),
+        due, paid,
+    )
+
+
+def apply_fee_delta(student_id, school_id, term, due=ZERO, paid=ZERO):
+    """Move a student's balance and the school's term totals by (due, paid)."""
+    if not due and not paid:
+        return
+    with transaction.atomic():
+        _apply(
+            StudentFeeBalance.objects.filter(student_id=student_id),
+            lambda **totals: StudentFeeBalance.objects.create(student_id=student_id, **totals),
+            due, paid,
+        )
+        _apply_school(school_id, term, due, paid)
+
+
+def move_student_fees(student_id, old_school_id, new_school_id):
+    """Shift a student's fee records from one school's term totals to another's, when the student transfers."""
+    terms = (
+        FeeRecord.objects.filter(student_id=student_id)
+        .order_by()
+        .values('term')
+        .annotate(due=Sum('amount_due'), paid=Sum('amount_paid'))
+        .values_list('term', 'due', 'paid')
+    )
+    with transaction.atomic():
+        for term, due, paid in terms:
+            _apply_school(old_school_id, term, -due, -paid)
+            _apply_school(new_school_id, term, due, paid)
+
+
+def _raw_student_totals():
+    return (
+        FeeRecord.objects.order_by()
+        .values('student_id')
+        .annotate(due=Sum('amount_due'), paid=Sum('amount_paid'))
+    )
+
+
+def _raw_school_totals():
+    return (
+        FeeRecord.objects.order_by()
+        .values('student__school_id', 'term')
+        .annotate(due=Sum('amount_due'), paid=Sum('amount_paid'))
+    )
+
+
+def fee_ledger_mismatches():
+    """
+    Compare the ledger with raw FeeRecord rows. Returns a list of
+    (description, ledger (due, paid), raw (due, paid)) for every difference.
+    """
+    mismatches = []
+
+    ledger = dict(
+        (row[0], row[1:])
+        for row in StudentFeeBalance.objects.values_list('student_id', 'total_due', 'total_paid').iterator()
+    )
+    for row in _raw_student_totals().iterator():
+        raw = (row['due'], row['paid'])
+        stored = ledger.pop(row['student_id'], (ZERO, ZERO))
+        if stored != raw:
+            mismatches.append((f"student {row['student_id']}", stored, raw))
+    for student_id, stored in ledger.items():
+        if stored != (ZERO, ZERO):
+            mismatches.append((f"student {student_id}", stored, (ZERO, ZERO)))
+
+    totals = dict(
+        ((row[0], row[1]), row[2:])
+        for row in SchoolFeeTotal.objects.values_list('school_id', 'term', 'total_due', 'total_paid')
+    )
+    for row in _raw_school_totals():
+        key = (row['student__school_id'], row['term'])
+        raw = (row['due'], row['paid'])
+        stored = totals.pop(key, (ZERO, ZERO))
+        if stored != raw:
+            mismatches.append((f"school {key[0]} term {key[1]}", stored, raw))
+    for (school_id, term), stored in totals.items():
+        if stored != (ZERO, ZERO):
+            mismatches.append((f"school {school_id} term {term}", stored, (ZERO, ZERO)))
+    return mismatches
+
+
+def rebuild_fee_ledger():
+    """Recompute StudentFeeBalance and SchoolFeeTotal from raw FeeRecord rows."""
+    with transaction.atomic():
+        StudentFeeBalance.objects.all().delete()
+        SchoolFeeTotal.objects.all().delete()
+
+        balances = (
+            StudentFeeBalance(student_id=row['student_id'], total_due=row['due'], total_paid=row['paid'])
+            for row in _raw_student_totals().iterator(chunk_size=2000)
+        )
+        while batch := list(islice(balances, 500)):
+            StudentFeeBalance.objects.bulk_create(batch)
+
+        SchoolFeeTotal.objects.bulk_create(
+            [
+                SchoolFeeTotal(
+                    school_id=row['student__school_id'], term=row['term'],
+                    total_due=row['due'], total_paid=row['paid'],
+                )
+                for row in _raw_school_totals()
+            ],
+            batch_size=500,
+        )
+        for school_id in School.objects.values_list('pk', flat=True):
+            bump_school_version(school_id)
@@ -0,0 +1,70 @@
+# theschool/id_utils.py
+import re
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import IdSequence, Student, SupportStaff, Teacher
+
+# kind -> (model, field holding the generated ID)
+ID_FIELDS = {
+    'student': (Student, 'registration_number'),
+    'teacher': (Teacher, 'teacher_id'),
+    'staff': (SupportStaff, 'working_id'),
+}
+
+_LEADING_LETTERS = re.compile(r'^\D*')
+
+
+def format_registration_number(first_name, last_name, school_id, number):
+    initials = first_name[0] + last_name[0]
+    return f"{initials.upper()}{school_id:03d}{number:04d}"
+
+
+def format_teacher_id(first_name, last_name, school_id, number):
+    initials = first_name[0] + last_name[0]
+    return f"T{initials.upper()}{school_id:03d}{number:04d}"
+
+
+def format_working_id(name, school_id, number):
+    initials = ''.join([part[0] for part in name.split() if part])[:2].upper()
+    return f"S{initials}{school_id:03d}{number:04d}"
+
+
+def highest_issued(school_id, kind):
+    """
+    Largest sequence number already present in the school's IDs. Only used to
+    seed a sequence the first time it is touched.
+    """
+    model, field = ID_FIELDS[kind]
+    prefix = f"{school_id:03d}"
+    highest = 0
+    for value in model.objects.filter(school_id=school_id).values_list(field, flat=True).iterator():
+        digits = _LEADING_LETTERS.sub('', value or '')
+        if digits.startswith(prefix) and digits[len(prefix):].isdigit():
+            highest = max(highest, int(digits[len(prefix):]))
+    return highest
+
+
+def reserve_numbers(school_id, kind, count=1):
+    """
+    Atomically reserve `count` consecutive numbers for (school, kind) and
+    return them as a range. Numbers are never reused, even after deletions.
+    """
+    if count < 1:
+        raise ValueError("count must be at least 1")
+
+    sequence = IdSequence.objects.filter(school_id=school_id, kind=kind)
+    with transaction.atomic():
+        if not sequence.update(last_value=F('last_value') + count):
+            try:
+                with transaction.atomic():
+                    IdSequence.objects.create(
+                        school_id=school_id, kind=kind,
+                        last_value=highest_issued(school_id, kind) + count,
+                    )
+            except IntegrityError:
+                # Another request seeded it first; take our block from theirs.
+                sequence.update(last_value=F('last_value') + count)
+        last = sequence.values_list('last_value', flat=True).get()
+    return range(last - count + 1, last + 1)
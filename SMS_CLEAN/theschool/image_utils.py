@@ -0,0 +1,130 @@
+# theschool/image_utils.py
+"""
+Photo processing: uploads are normalised before they are stored (EXIF
+orientation applied, longest side capped, recompressed as JPEG) and
+square thumbnail variants are rendered in a background thread once the
+saving transaction commits.
+
+Variants live beside the original under thumbs/<size>/, e.g.
+student_photos/amani.png -> thumbs/small/student_photos/amani.png.jpg.
+"""
+import io
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+MAX_DIMENSION = getattr(settings, 'PHOTO_MAX_DIMENSION', 1600)
+JPEG_QUALITY = getattr(settings, 'PHOTO_JPEG_QUALITY', 85)
+# name -> edge length in pixels; small is the list-page avatar, medium the profile picture.
+THUMBNAIL_SIZES = getattr(settings, 'THUMBNAIL_SIZES', {'small': 96, 'medium': 320})
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='thumbnails')
+
+
+def _encode_jpeg(image):
+    if image.mode in ('RGBA', 'LA', 'P'):
+        from PIL import Image
+
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def normalize_photo(fieldfile):
+    """
+    Replace a not-yet-saved upload on an ImageField with an upright JPEG no
+    larger than MAX_DIMENSION on its longest side. Files that Pillow cannot
+    read are left untouched; images too large to decode safely (decompression
+    bombs) raise ValidationError.
+    """
+    if not fieldfile or getattr(fieldfile, '_committed', True):
+        return
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    upload = fieldfile.file
+    try:
+        upload.seek(0)
+        with Image.open(upload) as original:
+            image = ImageOps.exif_transpose(original)
+            image.thumbnail((MAX_DIMENSION, MAX_DIMENSION), Image.LANCZOS)
+            data = _encode_jpeg(image)
+    except Image.DecompressionBombError:
+        raise ValidationError("The photo is too large; upload a smaller image.")
+    except (UnidentifiedImageError, OSError) as exc:
+        logger.warning("Storing %s unprocessed: %s", fieldfile.name, exc)
+        upload.seek(0)
+        return
+
+    stem = posixpath.splitext(posixpath.basename(fieldfile.name))[0]
+    # FieldFile.save(save=False) runs upload_to and storage naming as usual.
+    fieldfile.save(f"{stem}.jpg", ContentFile(data), save=False)
+
+
+def thumbnail_name(name, size):
+    # The source extension stays in the name, so a.png and a.jpg get separate variants.
+    return posixpath.join('thumbs', size, name + '.jpg')
+
+
+def generate_thumbnails(name, force=False, storage=None):
+    """Render every THUMBNAIL_SIZES variant of the stored image `name`. Returns the count written."""
+    from PIL import Image, ImageOps
+
+    storage = storage or default_storage
+    wanted = [
+        (size, edge) for size, edge in THUMBNAIL_SIZES.items()
+        if force or not storage.exists(thumbnail_name(name, size))
+    ]
+    if not wanted:
+        return 0
+    with storage.open(name, 'rb') as handle, Image.open(handle) as original:
+        image = ImageOps.exif_transpose(original)
+        image.load()
+    for size, edge in wanted:
+        variant = ImageOps.fit(image, (edge, edge), Image.LANCZOS)
+        target = thumbnail_name(name, size)
+        if storage.exists(target):
+            storage.delete(target)
+        storage.save(target, ContentFile(_encode_jpeg(variant)))
+    return len(wanted)
+
+
+def _generate_quietly(name):
+    try:
+        generate_thumbnails(name)
+    except Exception:
+        logger.exception("Could not render thumbnails for %s", name)
+
+
+def schedule_thumbnails(name):
+    """Render thumbnails for `name` after the current transaction commits, off the request thread."""
+    if not name:
+        return
+    if getattr(settings, 'THUMBNAILS_ASYNC', True):
+        transaction.on_commit(lambda: _executor.submit(_generate_quietly, name))
+    else:
+        transaction.on_commit(lambda: _generate_quietly(name))
+
+
+def thumbnail_url(fieldfile, size='small', storage=None):
+    """URL of the `size` variant of `fieldfile`, or the original's until the variant exists."""
+    if not fieldfile:
+        return ''
+    storage = storage or default_storage
+    target = thumbnail_name(fieldfile.name, size)
+    if size in THUMBNAIL_SIZES and storage.exists(target):
+        return storage.url(target)
+    return fieldfile.url
@@ -0,0 +1,187 @@
+# theschool/import_utils.py
+import csv
+import io
+from datetime import date, datetime
+from itertools import islice
+
+from django.db import transaction
+from django.utils.dateparse import parse_date
+
+from .cache_utils import bump_school_version
+from .id_utils import format_registration_number, reserve_numbers
+from .models import GuardianDetails, ParentDetails, Stream, Student
+from .search_utils import index_objects
+
+CHUNK_SIZE = 500
+
+# Column names follow the add_student form; the aliases cover common spreadsheet headings.
+COLUMN_ALIASES = {
+    'stream': 'stream_name',
+    'dob': 'date_of_birth',
+    'guardian_name': 'full_name',
+    'guardian_phone': 'phone',
+    'guardian_occupation': 'occupation',
+}
+PARENT_FIELDS = (
+    'father_name', 'father_phone', 'father_occupation',
+    'mother_name', 'mother_phone', 'mother_occupation',
+)
+GENDERS = {'male': 'Male', 'm': 'Male', 'female': 'Female', 'f': 'Female'}
+
+
+def _column(header):
+    key = str(header or '').strip().lower().replace(' ', '_')
+    return COLUMN_ALIASES.get(key, key)
+
+
+def _iter_csv(fileobj):
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    reader = csv.reader(text)
+    header = [_column(h) for h in next(reader, [])]
+    for values in reader:
+        yield dict(zip(header, values))
+
+
+def _iter_xlsx(fileobj):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("Reading .xlsx files requires the openpyxl package.")
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [_column(h) for h in next(rows, ())]
+        for values in rows:
+            yield dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def iter_rows(fileobj, filename):
+    """Yield one dict per data row, streaming the file rather than loading it."""
+    if filename.lower().endswith('.xlsx'):
+        return _iter_xlsx(fileobj)
+    if filename.lower().endswith('.csv'):
+        return _iter_csv(fileobj)
+    raise ValueError("Upload a .csv or .xlsx file.")
+
+
+def _text(row, key):
+    value = row.get(key)
+    if value is None:
+        return ''
+    return str(value).strip()
+
+
+def _clean_row(row):
+    """Validate one row. Returns (cleaned dict, None) or (None, error message)."""
+    first_name, last_name = _text(row, 'first_name'), _text(row, 'last_name')
+    if not first_name or not last_name:
+        return None, "first_name and last_name are required"
+
+    stream_name = _text(row, 'stream_name')
+    if not stream_name:
+        return None, "stream_name is required"
+
+    gender = GENDERS.get(_text(row, 'gender').lower(), None if _text(row, 'gender') else 'Male')
+    if gender is None:
+        return None, f"unknown gender '{_text(row, 'gender')}'"
+
+    dob = row.get('date_of_birth')
+    if isinstance(dob, datetime):
+        dob = dob.date()
+    elif not isinstance(dob, date):
+        try:
+            dob = parse_date(_text(row, 'date_of_birth')) if _text(row, 'date_of_birth') else date(2000, 1, 1)
+        except ValueError:
+            dob = None
+        if dob is None:
+            return None, f"invalid date_of_birth '{_text(row, 'date_of_birth')}' (use YYYY-MM-DD)"
+
+    return {
+        'first_name': first_name,
+        'last_name': last_name,
+        'date_of_birth': dob,
+        'gender': gender,
+        'religion': _text(row, 'religion') or 'None',
+        'grade': _text(row, 'grade') or 'Grade 1',
+        'stream_name': stream_name,
+        'parent': {field: _text(row, field) for field in PARENT_FIELDS},
+        'guardian': {
+            'full_name': _text(row, 'full_name'),
+            'phone': _text(row, 'phone'),
+            'occupation': _text(row, 'occupation'),
+        },
+    }, None
+
+
+def _write_chunk(school, chunk, streams):
+    """Insert one chunk of cleaned rows with a handful of bulk statements."""
+    numbers = reserve_numbers(school.id, 'student', len(chunk))
+    students = []
+    for number, row in zip(numbers, chunk):
+        key = row['stream_name'].lower()
+        if key not in streams:
+            streams[key] = Stream.objects.create(name=row['stream_name'], school=school).id
+        students.append(Student(
+            school=school,
+            first_name=row['first_name'],
+            last_name=row['last_name'],
+            date_of_birth=row['date_of_birth'],
+            gender=row['gender'],
+            religion=row['religion'],
+            grade=row['grade'],
+            stream_id=streams[key],
+            registration_number=format_registration_number(
+                row['first_name'], row['last_name'], school.id, number
+            ),
+        ))
+    Student.objects.bulk_create(students)
+    bump_school_version(school.id)  # bulk_create sends no post_save
+
+    parents, guardians = [], []
+    for student, row in zip(students, chunk):
+        if row['parent']['father_name'] or row['parent']['mother_name']:
+            parents.append(ParentDetails(student=student, **row['parent']))
+        elif row['guardian']['full_name']:
+            guardians.append(GuardianDetails(student=student, **row['guardian']))
+    ParentDetails.objects.bulk_create(parents)
+    GuardianDetails.objects.bulk_create(guardians)
+    index_objects('student', [student.pk for student in students])
+
+
+def import_students(school, fileobj, filename, chunk_size=CHUNK_SIZE):
+    """
+    Stream a CSV/XLSX roster into `school`.
+
+    Valid rows are written in chunks of `chunk_size`, each chunk in its own
+    transaction; invalid rows are skipped and reported. Returns
+    {"rows": int, "created": int, "errors": [(row_number, message), ...]}
+    where row_number is the spreadsheet row (the header is row 1).
+    """
+    streams = {
+        name.lower(): pk
+        for pk, name in Stream.objects.filter(school=school).order_by('-pk').values_list('pk', 'name')
+    }
+    report = {'rows': 0, 'created': 0, 'errors': []}
+    rows = enumerate(iter_rows(fileobj, filename), start=2)
+
+    while batch := list(islice(rows, chunk_size)):
+        chunk = []
+        for line, raw in batch:
+            if not any(_text(raw, key) for key in raw):
+                continue  # blank line
+            report['rows'] += 1
+            cleaned, error = _clean_row(raw)
+            if error:
+                report['errors'].append((line, error))
+            else:
+                chunk.append(cleaned)
+        if chunk:
+            # Streams created by a chunk only join the map once it commits.
+            chunk_streams = dict(streams)
+            with transaction.atomic():
+                _write_chunk(school, chunk, chunk_streams)
+            streams = chunk_streams
+            report['created'] += len(chunk)
+    return report
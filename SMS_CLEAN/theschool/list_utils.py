@@ -0,0 +1,121 @@
+# theschool/list_utils.py
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+PAGE_SIZE = 50
+
+
+def _encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return value, int(pk)
+    except (ValueError, TypeError):
+        return None
+
+
+def _seek(field, value, pk, descending):
+    """Rows strictly after (value, pk) in the given direction."""
+    op = 'lt' if descending else 'gt'
+    return Q(**{f'{field}__{op}': value}) | Q(**{field: value, f'pk__{op}': pk})
+
+
+class KeysetPage:
+    """One page of a keyset-paginated list plus the links the template needs."""
+
+    def __init__(self, request, object_list, sort, sorts, first_key, last_key, has_previous, has_next):
+        self.object_list = object_list
+        self.sort = sort
+        self.has_previous = has_previous
+        self.has_next = has_next
+        self._params = request.GET.copy()
+        for key in ('after', 'before'):
+            self._params.pop(key, None)
+
+        self.next_url = self._url(after=_encode_cursor(last_key)) if has_next else None
+        self.previous_url = self._url(before=_encode_cursor(first_key)) if has_previous else None
+        self.sort_links = {
+            key: self._url(sort=f'-{key}' if sort == key else key) for key in sorts
+        }
+
+    def _url(self, **changes):
+        params = self._params.copy()
+        for key, value in changes.items():
+            params[key] = value
+        return '?' + params.urlencode()
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+def paginate_keyset(request, queryset, sorts, default_sort, filters=None, page_size=PAGE_SIZE):
+    """
+    Seek-paginate `queryset` from the request's query string.
+
+    `sorts` maps a sort key (used as ?sort=key / ?sort=-key) to a non-null
+    model field; rows are ordered by (field, pk) and fetched with
+    `field > last value` rather than OFFSET, so every page costs the same as
+    the first. `filters` maps query parameters to lookups that are applied
+    when the parameter is present, e.g. {'grade': 'grade'}.
+    """
+    for param, lookup in (filters or {}).items():
+        value = request.GET.get(param)
+        if value:
+            try:
+                queryset = queryset.filter(**{lookup: value})
+            except (ValueError, ValidationError):
+                pass  # e.g. ?stream=abc; ignore the malformed filter
+
+    sort = request.GET.get('sort', default_sort)
+    if sort.lstrip('-') not in sorts:
+        sort = default_sort
+    descending = sort.startswith('-')
+    field = sorts[sort.lstrip('-')]
+
+    after = _decode_cursor(request.GET.get('after', ''))
+    before = None if after else _decode_cursor(request.GET.get('before', ''))
+
+    if before:
+        # Walk backwards from the cursor, then flip the rows back into display order.
+        queryset = queryset.filter(_seek(field, *before, descending=not descending))
+        ordering = (field, 'pk') if descending else (f'-{field}', '-pk')
+    else:
+        if after:
+            queryset = queryset.filter(_seek(field, *after, descending=descending))
+        ordering = (f'-{field}', '-pk') if descending else (field, 'pk')
+
+    rows = list(queryset.order_by(*ordering)[:page_size + 1])
+    more = len(rows) > page_size
+    rows = rows[:page_size]
+    if before:
+        rows.reverse()
+
+    def key(obj):
+        value = obj
+        for part in field.split('__'):
+            value = getattr(value, part)
+        return [value, obj.pk]
+
+    return KeysetPage(
+        request,
+        rows,
+        sort,
+        sorts,
+        first_key=key(rows[0]) if rows else None,
+        last_key=key(rows[-1]) if rows else None,
+        has_previous=more if before else bool(after),
+        has_next=bool(rows) if before else more,
+    )
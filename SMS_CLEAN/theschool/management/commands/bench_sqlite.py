@@ -0,0 +1,175 @@
+import json
+import os
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# "default" is how Django opened db.sqlite3 before the production profile:
+# rollback journal, synchronous=FULL, a 5 s busy timeout and deferred transactions.
+PROFILES = {
+    'default': {'pragmas': {}, 'timeout': 5, 'begin': 'BEGIN'},
+    'production': {'pragmas': settings.SQLITE_PRAGMAS, 'timeout': 20, 'begin': 'BEGIN IMMEDIATE'},
+}
+
+SCHEMA = """
+    CREATE TABLE attendance (
+        id INTEGER PRIMARY KEY,
+        student_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        status TEXT NOT NULL
+    );
+    CREATE UNIQUE INDEX attendance_student_date ON attendance (student_id, date);
+    CREATE INDEX attendance_date_status ON attendance (date, status);
+"""
+STUDENTS = 400
+SEED_DAYS = 120
+
+
+def _connect(path, profile):
+    conn = sqlite3.connect(path, timeout=profile['timeout'], isolation_level=None)
+    for name, value in profile['pragmas'].items():
+        conn.execute(f'PRAGMA {name}={value}')
+    return conn
+
+
+def _seed(path):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.executescript(SCHEMA)
+    start = date.today() - timedelta(days=SEED_DAYS)
+    conn.execute('BEGIN')
+    conn.executemany(
+        'INSERT INTO attendance (student_id, date, status) VALUES (?, ?, ?)',
+        (
+            (student, (start + timedelta(days=day)).isoformat(), 'present' if (student + day) % 9 else 'absent')
+            for day in range(SEED_DAYS) for student in range(STUDENTS)
+        ),
+    )
+    conn.execute('COMMIT')
+    conn.close()
+
+
+class _Worker(threading.Thread):
+    def __init__(self, path, profile, deadline, index):
+        super().__init__(daemon=True)
+        self.path, self.profile, self.deadline, self.index = path, profile, deadline, index
+        self.done, self.locked, self.latencies = 0, 0, []
+
+    def run(self):
+        conn = _connect(self.path, self.profile)
+        try:
+            while time.monotonic() < self.deadline:
+                started = time.monotonic()
+                try:
+                    self.step(conn)
+                except sqlite3.OperationalError as exc:
+                    if 'locked' not in str(exc) and 'busy' not in str(exc):
+                        raise
+                    if conn.in_transaction:
+                        conn.execute('ROLLBACK')
+                    self.locked += 1
+                    continue
+                self.done += 1
+                self.latencies.append(time.monotonic() - started)
+        finally:
+            conn.close()
+
+
+class _Writer(_Worker):
+    """Saves one class register: check what is already marked, then replace it."""
+    class_size = 40
+
+    def step(self, conn):
+        today = (date.today() + timedelta(days=self.done)).isoformat()
+        first = (self.index * self.class_size) % STUDENTS
+        students = range(first, first + self.class_size)
+        conn.execute(self.profile['begin'])
+        conn.execute(
+            'SELECT COUNT(*) FROM attendance WHERE date = ? AND student_id BETWEEN ? AND ?',
+            [today, first, first + self.class_size - 1],
+        ).fetchone()
+        conn.execute(
+            'DELETE FROM attendance WHERE date = ? AND student_id BETWEEN ? AND ?',
+            [today, first, first + self.class_size - 1],
+        )
+        conn.executemany(
+            'INSERT INTO attendance (student_id, date, status) VALUES (?, ?, ?)',
+            [(student, today, 'present') for student in students],
+        )
+        conn.execute('COMMIT')
+
+
+class _Reader(_Worker):
+    """The dashboard's weekly attendance breakdown."""
+
+    def step(self, conn):
+        since = (date.today() - timedelta(days=7)).isoformat()
+        conn.execute(
+            'SELECT date, status, COUNT(*) FROM attendance WHERE date >= ? GROUP BY date, status',
+            [since],
+        ).fetchall()
+
+
+def _p95(latencies):
+    if len(latencies) < 2:
+        return sum(latencies) * 1000
+    return statistics.quantiles(latencies, n=20)[-1] * 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure concurrent read/write throughput on a scratch SQLite file, with the old "
+        "default connection settings and with the production profile from settings.SQLITE_PRAGMAS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5.0, help="Duration of each run.")
+        parser.add_argument('--writers', type=int, default=4, help="Threads saving class registers.")
+        parser.add_argument('--readers', type=int, default=8, help="Threads reading dashboard stats.")
+        parser.add_argument('--profile', choices=sorted(PROFILES), action='append',
+                            help="Profile to run (repeatable); both by default.")
+        parser.add_argument('--json', action='store_true', help="Print results as JSON.")
+
+    def handle(self, *args, **options):
+        results = [self._run(name, options) for name in options['profile'] or list(PROFILES)]
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(
+            f"{'profile':<12}{'writes/s':>10}{'reads/s':>10}{'locked':>9}{'write p95':>12}{'read p95':>11}"
+        )
+        for row in results:
+            self.stdout.write(
+                f"{row['profile']:<12}{row['writes_per_s']:>10.1f}{row['reads_per_s']:>10.1f}"
+                f"{row['locked_errors']:>9}{row['write_p95_ms']:>10.1f}ms{row['read_p95_ms']:>9.1f}ms"
+            )
+
+    def _run(self, name, options):
+        profile = PROFILES[name]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.sqlite3')
+            _seed(path)
+            _connect(path, profile).close()  # journal_mode=wal persists in the file
+
+            deadline = time.monotonic() + options['seconds']
+            writers = [_Writer(path, profile, deadline, i) for i in range(options['writers'])]
+            readers = [_Reader(path, profile, deadline, i) for i in range(options['readers'])]
+            for worker in writers + readers:
+                worker.start()
+            for worker in writers + readers:
+                worker.join()
+
+        seconds = options['seconds']
+        return {
+            'profile': name,
+            'writes_per_s': sum(w.done for w in writers) / seconds,
+            'reads_per_s': sum(r.done for r in readers) / seconds,
+            'locked_errors': sum(w.locked for w in writers + readers),
+            'write_p95_ms': _p95([t for w in writers for t in w.latencies]),
+            'read_p95_ms': _p95([t for r in readers for t in r.latencies]),
+        }
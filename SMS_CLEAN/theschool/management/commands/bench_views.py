@@ -0,0 +1,189 @@
+import json
+import statistics
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from theschool.models import Attendance, School, Student, User
+from theschool.replica_utils import replica_configured
+from theschool.seed_utils import generate_schools, scratch_database
+from theschool.stats_utils import DASHBOARD_PANELS
+
+# Absolute slack on top of --tolerance, so sub-millisecond jitter is not a regression.
+LATENCY_SLACK_MS = 5.0
+DEFAULT_BASELINE = settings.BASE_DIR / 'bench_baseline.json'
+
+
+def _dashboard(ctx):
+    # The shell and the four panel requests its page makes.
+    return [('get', reverse('dashboard'), None)] + [
+        ('get', reverse('dashboard_panel_data', args=[panel]), None) for panel in DASHBOARD_PANELS
+    ]
+
+
+def _submit_attendance(ctx):
+    ctx['toggle'] = not ctx.get('toggle')
+    return [('post', reverse('record_attendance'), {
+        'student_id': ctx['student_id'],
+        'date': timezone.localdate().isoformat(),
+        'status': 'Present' if ctx['toggle'] else 'Absent',
+    })]
+
+
+# name -> (user, requests for one page view)
+SCENARIOS = {
+    'dashboard': ('admin', _dashboard),
+    'platform_dashboard': ('platform', lambda ctx: [('get', reverse('platform_dashboard'), None)]),
+    'manage_students': ('admin', lambda ctx: [('get', reverse('manage_students'), None)]),
+    'record_attendance': ('teacher', lambda ctx: [('get', reverse('record_attendance'), None)]),
+    'record_attendance_submit': ('teacher', _submit_attendance),
+}
+EXPECTED_STATUS = {'get': 200, 'post': 302}
+
+
+def _percentile(samples, pct):
+    if len(samples) < 2:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method='inclusive')[pct - 1]
+
+
+def compare(results, baseline, tolerance):
+    """Regression messages for views slower (p95) or chattier (queries) than the baseline."""
+    for key in ('scale', 'warm_cache'):
+        if baseline.get(key) != results[key]:
+            raise CommandError(
+                f"The baseline was recorded with {key} {baseline.get(key)}, this run has {results[key]}; "
+                "rerun the same way or save a new baseline."
+            )
+    regressions = []
+    for name, row in results['views'].items():
+        base = baseline['views'].get(name)
+        if base is None:
+            continue
+        if row['queries'] > base['queries']:
+            regressions.append(f"{name}: {row['queries']} queries (baseline {base['queries']})")
+        limit = base['p95_ms'] * (1 + tolerance) + LATENCY_SLACK_MS
+        if row['p95_ms'] > limit:
+            regressions.append(f"{name}: p95 {row['p95_ms']:.1f} ms (baseline {base['p95_ms']:.1f} ms)")
+    return regressions
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the hot views through the test client against a scratch database of synthetic "
+        "schools. Prints p50/p95 latency and query counts as JSON and fails on regressions "
+        "against a stored baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=str(settings.BASE_DIR / 'bench.sqlite3'),
+                            help="Scratch SQLite file to generate the data into.")
+        parser.add_argument('--keepdb', action='store_true',
+                            help="Reuse the scratch database (and its data) from an earlier run.")
+        parser.add_argument('--schools', type=int, default=3)
+        parser.add_argument('--students', type=int, default=2000, help="Students per school.")
+        parser.add_argument('--days', type=int, default=365, help="Days of attendance history.")
+        parser.add_argument('--iterations', type=int, default=30, help="Measured page views per scenario.")
+        parser.add_argument('--warmup', type=int, default=3, help="Unmeasured page views per scenario first.")
+        parser.add_argument('--warm-cache', action='store_true',
+                            help="Keep the cache between page views (measures cache hits instead of the work).")
+        parser.add_argument('--scenario', choices=sorted(SCENARIOS), action='append',
+                            help="Scenario to run (repeatable); all by default.")
+        parser.add_argument('--baseline',
+                            help=f"Baseline file to compare against (default {DEFAULT_BASELINE.name}; "
+                                 "an error if given and missing).")
+        parser.add_argument('--save-baseline', action='store_true', help="Write this run as the new baseline.")
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help="Allowed p95 slowdown over the baseline, as a fraction.")
+
+    def handle(self, *args, **options):
+        if replica_configured():
+            raise CommandError("Unset ANALYTICS_DB; the benchmark reads its own scratch database only.")
+        # Checked before the run: an explicit baseline that is missing must not pass silently.
+        if options['baseline'] and not options['save_baseline'] and not Path(options['baseline']).exists():
+            raise CommandError(f"No baseline at {options['baseline']}; rerun with --save-baseline to record one.")
+
+        with scratch_database(options['database'], keepdb=options['keepdb']):
+            if not School.objects.exists():
+                self.stderr.write(f"Generating {options['schools']} schools into {options['database']} ...")
+                generate_schools(options['schools'], options['students'], options['days'])
+            results = self._run(options)
+
+        self.stdout.write(json.dumps(results, indent=2))
+        self._check_baseline(results, options)
+
+    def _run(self, options):
+        school = School.objects.order_by('pk').first()
+        platform, _ = User.objects.get_or_create(
+            username='bench-platform', defaults={'role': 'platform_admin', 'is_platform_admin': True},
+        )
+        ctx = {
+            'student_id': Student.objects.filter(school=school).values_list('pk', flat=True).first(),
+            'users': {
+                'admin': User.objects.get(username=f"s{school.pk}-admin"),
+                'teacher': User.objects.get(username=f"s{school.pk}-teacher1"),
+                'platform': platform,
+            },
+        }
+
+        views = {}
+        for name in options['scenario'] or list(SCENARIOS):
+            who, build = SCENARIOS[name]
+            client = Client()
+            client.force_login(ctx['users'][who])
+            timings, queries = [], 0
+            for n in range(options['warmup'] + options['iterations']):
+                if not options['warm_cache']:
+                    cache.clear()
+                page = build(ctx)
+                started = time.perf_counter()
+                with CaptureQueriesContext(connection) as captured:
+                    for method, url, data in page:
+                        response = getattr(client, method)(url, data)
+                        if response.status_code != EXPECTED_STATUS[method]:
+                            raise CommandError(f"{name}: {method.upper()} {url} returned {response.status_code}")
+                elapsed = (time.perf_counter() - started) * 1000
+                if n >= options['warmup']:
+                    timings.append(elapsed)
+                    queries = max(queries, len(captured))
+            views[name] = {
+                'requests': len(page),
+                'p50_ms': round(_percentile(timings, 50), 2),
+                'p95_ms': round(_percentile(timings, 95), 2),
+                'queries': queries,
+            }
+
+        return {
+            'scale': {
+                'schools': School.objects.count(),
+                'students_per_school': Student.objects.filter(school=school).count(),
+                'attendance_per_school': Attendance.objects.filter(student__school=school).count(),
+            },
+            'warm_cache': options['warm_cache'],
+            'views': views,
+        }
+
+    def _check_baseline(self, results, options):
+        path = Path(options['baseline'] or DEFAULT_BASELINE)
+        if options['save_baseline']:
+            path.write_text(json.dumps(results, indent=2) + '\n')
+            self.stderr.write(f"Saved baseline to {path}.")
+            return
+        if not path.exists():
+            self.stderr.write(f"No baseline at {path}; rerun with --save-baseline to record one.")
+            return
+
+        regressions = compare(results, json.loads(path.read_text()), options['tolerance'])
+        if regressions:
+            for line in regressions:
+                self.stderr.write(line)
+            raise CommandError(f"{len(regressions)} regressions against {path}.")
+        self.stderr.write(self.style.SUCCESS(f"No regressions against {path}."))
@@ -0,0 +1,75 @@
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from theschool.image_utils import THUMBNAIL_SIZES, generate_thumbnails, thumbnail_name
+from theschool.media_utils import PHOTO_FIELDS, rebuild_references, referenced_names
+from theschool.storage import photo_storage
+
+
+class Command(BaseCommand):
+    help = (
+        "Move stored photos to content-addressed names so identical files are kept once, "
+        "then recount references. Old copies are deleted once nothing points at them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Report what would change without touching anything.")
+        parser.add_argument('--prune', action='store_true',
+                            help="Also delete files in the photo folders that no row references.")
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        prefix = photo_storage.directory + '/'
+        moved, missing, freed = {}, [], 0
+
+        for name in sorted(referenced_names()):
+            if name.startswith(prefix):
+                continue
+            if not photo_storage.exists(name):
+                missing.append(name)
+                continue
+            with photo_storage.open(name, 'rb') as handle:
+                target = photo_storage.hashed_name(name, File(handle))
+                if not dry_run:
+                    target = photo_storage.save(name, File(handle, name))
+            moved[name] = target
+
+        if not dry_run:
+            with transaction.atomic():
+                for model, field in PHOTO_FIELDS.items():
+                    for old, new in moved.items():
+                        model.objects.filter(**{field: old}).update(**{field: new})
+                rebuild_references()
+
+        # Originals are now unreferenced; optionally so is anything else left in the upload folders.
+        stale = set(moved)
+        if options['prune']:
+            referenced = set(referenced_names()) - set(moved)
+            for model, field in PHOTO_FIELDS.items():
+                folder = model._meta.get_field(field).upload_to.rstrip('/')
+                if not photo_storage.exists(folder):
+                    continue
+                for filename in photo_storage.listdir(folder)[1]:
+                    name = f"{folder}/{filename}"
+                    if name not in referenced:
+                        stale.add(name)
+
+        for name in sorted(stale):
+            freed += photo_storage.size(name)
+            if not dry_run:
+                photo_storage.delete(name)
+                for size in THUMBNAIL_SIZES:
+                    photo_storage.delete(thumbnail_name(name, size))
+
+        if not dry_run:
+            for target in set(moved.values()):
+                generate_thumbnails(target)
+
+        for name in missing:
+            self.stderr.write(f"Missing on disk, left as is: {name}")
+        verb = "Would move" if dry_run else "Moved"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {len(moved)} photos into {len(set(moved.values()))} content-addressed files; "
+            f"{'would free' if dry_run else 'freed'} {freed / 1024:.0f} KB from {len(stale)} old files."
+        ))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from theschool.export_utils import EXPORTS, FORMATS, parse_bound, stream_export
+from theschool.models import School
+from theschool.replica_utils import analytics_db
+
+
+class Command(BaseCommand):
+    help = "Stream a school's students, attendance or fee records to CSV or JSONL."
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(EXPORTS))
+        parser.add_argument('--school', type=int, required=True, help="School id.")
+        parser.add_argument('--start', help="First date to include (YYYY-MM-DD).")
+        parser.add_argument('--end', help="Last date to include (YYYY-MM-DD).")
+        parser.add_argument('--format', default='csv', choices=sorted(FORMATS))
+        parser.add_argument('--output', help="File to write; defaults to stdout.")
+
+    def handle(self, *args, **options):
+        using = analytics_db()
+        school = School.objects.using(using).filter(pk=options['school']).first()
+        if school is None:
+            raise CommandError(f"School {options['school']} does not exist.")
+
+        try:
+            start = parse_bound(options['start'], 'start')
+            end = parse_bound(options['end'], 'end')
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        lines = stream_export(options['dataset'], school, start=start, end=end, fmt=options['format'], using=using)
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as out:
+                out.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from theschool.seed_utils import DEMO_PASSWORD, generate_schools
+
+
+class Command(BaseCommand):
+    help = (
+        "Add synthetic schools with streams, staff, parents, students, a year of daily "
+        "attendance and termly fee records, for load testing. Never run it against real data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schools', type=int, default=3, help="Schools to add.")
+        parser.add_argument('--students', type=int, default=2000, help="Students per school.")
+        parser.add_argument('--days', type=int, default=365, help="Days of attendance history (weekdays only).")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed; the same seed gives the same data.")
+
+    def handle(self, *args, **options):
+        if options['schools'] < 1 or options['students'] < 1 or options['days'] < 1:
+            raise CommandError("--schools, --students and --days must be at least 1.")
+
+        started = time.monotonic()
+        generate_schools(
+            options['schools'], options['students'], options['days'], seed=options['seed'],
+            log=lambda counts: self.stdout.write(
+                f"School {counts['school']}: {counts['students']} students, {counts['teachers']} teachers, "
+                f"{counts['parents']} parents, {counts['attendance']} attendance rows, "
+                f"{counts['fee_records']} fee records."
+            ),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {options['schools']} schools in {time.monotonic() - started:.1f} s. "
+            f"Logins are s<school id>-admin, -teacher<n> and -parent<n> with password '{DEMO_PASSWORD}'."
+        ))
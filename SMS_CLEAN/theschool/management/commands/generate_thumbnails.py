@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from theschool.image_utils import generate_thumbnails
+from theschool.media_utils import referenced_names
+
+
+class Command(BaseCommand):
+    help = "Render missing thumbnail variants for every stored student, teacher and staff photo."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Re-render variants that already exist.")
+
+    def handle(self, *args, **options):
+        names = referenced_names()
+
+        written = failed = 0
+        for name in sorted(names):
+            try:
+                written += generate_thumbnails(name, force=options['force'])
+            except (OSError, ValueError) as exc:
+                failed += 1
+                self.stderr.write(f"{name}: {exc}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {len(names)} photos: wrote {written} thumbnails, {failed} unreadable."
+        ))
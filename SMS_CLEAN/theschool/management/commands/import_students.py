@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from theschool.import_utils import import_students
+from theschool.models import School
+
+
+class Command(BaseCommand):
+    help = "Import students for a school from a .csv or .xlsx roster."
+
+    def add_arguments(self, parser):
+        parser.add_argument('school', type=int, help="School id.")
+        parser.add_argument('path', help="Path to the .csv or .xlsx file.")
+
+    def handle(self, *args, **options):
+        school = School.objects.filter(pk=options['school']).first()
+        if school is None:
+            raise CommandError(f"School {options['school']} does not exist.")
+
+        try:
+            with open(options['path'], 'rb') as fileobj:
+                report = import_students(school, fileobj, options['path'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for line, message in report['errors']:
+            self.stderr.write(f"Row {line}: {message}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Read {report['rows']} rows, created {report['created']} students, "
+            f"skipped {len(report['errors'])}."
+        ))
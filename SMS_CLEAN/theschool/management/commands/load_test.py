@@ -0,0 +1,298 @@
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import got_request_exception
+from django.db import OperationalError
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from theschool.models import School, Student, User
+from theschool.replica_utils import replica_configured
+from theschool.seed_utils import generate_schools, scratch_database
+from theschool.stats_utils import DASHBOARD_PANELS
+
+DEFAULT_MIX = 'teacher=70,admin=20,parent=10'
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class _PooledWSGIServer(WSGIServer):
+    """WSGIServer that handles connections on a fixed pool of threads, like one threaded app-server worker."""
+    request_queue_size = 1024
+
+    def __init__(self, address, threads):
+        super().__init__(address, _QuietHandler)
+        self.pool = ThreadPoolExecutor(threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+class _LockedErrors:
+    """Counts requests that failed with "database is locked", by (method, path)."""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.lock = threading.Lock()
+
+    def __call__(self, sender, request=None, **kwargs):
+        error = sys.exc_info()[1]
+        if isinstance(error, OperationalError) and 'locked' in str(error):
+            with self.lock:
+                self.counts[(request.method, request.path)] += 1
+
+
+class _VirtualUser(threading.Thread):
+    """One logged-in browser session repeating its role's page views until the deadline."""
+
+    def __init__(self, port, role, session_cookie, student_ids, deadline, think_time, seed):
+        super().__init__(daemon=True)
+        self.port, self.role, self.deadline, self.think_time = port, role, deadline, think_time
+        self.student_ids = student_ids
+        self.cookies = {settings.SESSION_COOKIE_NAME: session_cookie}
+        self.rng = random.Random(seed)
+        self.samples = defaultdict(list)   # action -> latencies (s)
+        self.errors = Counter()            # action -> failed page views
+        self.paths = defaultdict(set)      # action -> (method, path) it requested
+        self.sent = 0
+
+    def request(self, action, method, path, data=None, expect=200):
+        headers = {'Cookie': '; '.join(f'{k}={v}' for k, v in self.cookies.items())}
+        body = None
+        if data is not None:
+            body = urlencode(data)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            headers['X-CSRFToken'] = self.cookies.get(settings.CSRF_COOKIE_NAME, '')
+        self.paths[action].add((method, path))
+        self.sent += 1
+        conn = HTTPConnection('127.0.0.1', self.port, timeout=60)
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            cookies = SimpleCookie()
+            for header in response.headers.get_all('Set-Cookie') or []:
+                cookies.load(header)
+            self.cookies.update({name: morsel.value for name, morsel in cookies.items()})
+            return response.status == expect
+        except OSError:
+            return False
+        finally:
+            conn.close()
+
+    def record_attendance(self):
+        # Teachers open the form (which sets the CSRF cookie) and submit it.
+        path = reverse('record_attendance')
+        yield 'record_attendance_form', [('GET', path, None, 200)]
+        yield 'record_attendance', [('POST', path, {
+            'student_id': self.rng.choice(self.student_ids),
+            'date': timezone.localdate().isoformat(),
+            'status': 'Present' if self.rng.random() < 0.9 else 'Absent',
+        }, 302)]
+
+    def dashboard(self):
+        yield 'dashboard', [('GET', reverse('dashboard'), None, 200)] + [
+            ('GET', reverse('dashboard_panel_data', args=[panel]), None, 200) for panel in DASHBOARD_PANELS
+        ]
+
+    def parent_dashboard(self):
+        yield 'parent_dashboard', [('GET', reverse('parent_dashboard'), None, 200)]
+
+    def run(self):
+        pages = {'teacher': self.record_attendance, 'admin': self.dashboard, 'parent': self.parent_dashboard}
+        while time.monotonic() < self.deadline:
+            for action, requests in pages[self.role]():
+                started = time.monotonic()
+                ok = all([self.request(action, *spec) for spec in requests])
+                if ok:
+                    self.samples[action].append(time.monotonic() - started)
+                else:
+                    self.errors[action] += 1
+            if self.think_time:
+                time.sleep(self.rng.uniform(0, 2 * self.think_time))
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        role, _, weight = part.partition('=')
+        if role.strip() not in ('teacher', 'admin', 'parent') or not weight.strip().isdigit():
+            raise CommandError(f"Bad --mix entry '{part}'; use e.g. {DEFAULT_MIX}.")
+        mix[role.strip()] = int(weight)
+    if not sum(mix.values()):
+        raise CommandError("--mix weights add up to zero.")
+    return mix
+
+
+def assign_roles(users, mix):
+    """Split `users` between the roles in proportion to the mix (largest remainder)."""
+    total = sum(mix.values())
+    exact = {role: users * weight / total for role, weight in mix.items()}
+    counts = {role: int(share) for role, share in exact.items()}
+    for role in sorted(exact, key=lambda r: exact[r] - counts[r], reverse=True)[:users - sum(counts.values())]:
+        counts[role] += 1
+    return [role for role, count in counts.items() for _ in range(count)]
+
+
+def _percentile(samples, pct):
+    if len(samples) < 2:
+        return samples[0] if samples else 0.0
+    return statistics.quantiles(samples, n=100, method='inclusive')[pct - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve the app from an in-process WSGI server on localhost against a scratch database of "
+        "synthetic schools, replay a mix of logged-in teacher, admin and parent sessions from many "
+        "threads, and report throughput, latency percentiles and 'database is locked' errors."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=str(settings.BASE_DIR / 'loadtest.sqlite3'),
+                            help="Scratch SQLite file to generate the data into.")
+        parser.add_argument('--keepdb', action='store_true',
+                            help="Reuse the scratch database (and its data) from an earlier run.")
+        parser.add_argument('--schools', type=int, default=3)
+        parser.add_argument('--students', type=int, default=2000, help="Students per school.")
+        parser.add_argument('--days', type=int, default=365, help="Days of attendance history.")
+        parser.add_argument('--users', type=int, default=100, help="Concurrent sessions (client threads).")
+        parser.add_argument('--mix', default=DEFAULT_MIX, help="Relative share of each role's sessions.")
+        parser.add_argument('--server-threads', type=int, default=8,
+                            help="Request threads in the server, like one worker's thread count.")
+        parser.add_argument('--seconds', type=float, default=30.0, help="Duration of the run.")
+        parser.add_argument('--think-time', type=float, default=0.0,
+                            help="Mean pause between page views per session, in seconds.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', action='store_true', help="Print results as JSON.")
+
+    def handle(self, *args, **options):
+        if replica_configured():
+            raise CommandError("Unset ANALYTICS_DB; the load test uses its own scratch database only.")
+        roles = assign_roles(options['users'], parse_mix(options['mix']))
+
+        with scratch_database(options['database'], keepdb=options['keepdb'],
+                              ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, '127.0.0.1']):
+            if not School.objects.exists():
+                self.stderr.write(f"Generating {options['schools']} schools into {options['database']} ...")
+                generate_schools(options['schools'], options['students'], options['days'])
+            results = self._run(roles, options)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(
+            f"{results['users']} sessions, {results['server_threads']} server threads, {results['seconds']:.0f} s: "
+            f"{results['requests_per_s']:.1f} req/s, {results['locked_errors']} locked "
+            f"({results['locked_rate'] * 100:.2f}% of requests)"
+        )
+        self.stdout.write(
+            f"{'action':<24}{'pages':>7}{'pages/s':>9}{'errors':>8}{'locked':>8}"
+            f"{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"
+        )
+        for name, row in results['actions'].items():
+            self.stdout.write(
+                f"{name:<24}{row['pages']:>7}{row['pages_per_s']:>9.1f}{row['errors']:>8}{row['locked']:>8}"
+                f"{row['p50_ms']:>7.0f}ms{row['p95_ms']:>7.0f}ms{row['p99_ms']:>7.0f}ms{row['max_ms']:>7.0f}ms"
+            )
+
+    def _sessions(self, roles, rng):
+        """A session cookie per virtual user, spread over the schools' logins, plus each school's student ids."""
+        logins = {
+            role: list(User.objects.filter(role=role, school__isnull=False).order_by('pk'))
+            for role in set(roles)
+        }
+        students = defaultdict(list)
+        for pk, school_id in Student.objects.values_list('pk', 'school_id').iterator():
+            students[school_id].append(pk)
+
+        sessions = []
+        for n, role in enumerate(roles):
+            if not logins[role]:
+                raise CommandError(f"The scratch database has no {role} logins.")
+            user = logins[role][n % len(logins[role])]
+            client = Client()
+            client.force_login(user)
+            sessions.append((role, client.cookies[settings.SESSION_COOKIE_NAME].value, students[user.school_id]))
+        rng.shuffle(sessions)
+        return sessions
+
+    def _run(self, roles, options):
+        rng = random.Random(options['seed'])
+        sessions = self._sessions(roles, rng)
+
+        locked = _LockedErrors()
+        got_request_exception.connect(locked)
+        server = _PooledWSGIServer(('127.0.0.1', 0), options['server_threads'])
+        server.set_app(WSGIHandler())
+        serving = threading.Thread(target=server.serve_forever, daemon=True)
+        serving.start()
+        try:
+            deadline = time.monotonic() + options['seconds']
+            users = [
+                _VirtualUser(server.server_port, role, cookie, student_ids, deadline,
+                             options['think_time'], rng.random())
+                for role, cookie, student_ids in sessions
+            ]
+            started = time.monotonic()
+            for user in users:
+                user.start()
+            for user in users:
+                user.join()
+            elapsed = time.monotonic() - started
+        finally:
+            server.shutdown()
+            server.pool.shutdown(wait=True)
+            server.server_close()
+            got_request_exception.disconnect(locked)
+
+        actions = {}
+        for name in sorted({action for user in users for action in user.paths}):
+            latencies = [t * 1000 for user in users for t in user.samples[name]]
+            paths = set().union(*(user.paths[name] for user in users))
+            actions[name] = {
+                'pages': len(latencies),
+                'pages_per_s': len(latencies) / elapsed,
+                'errors': sum(user.errors[name] for user in users),
+                'locked': sum(locked.counts[key] for key in paths),
+                'p50_ms': _percentile(latencies, 50),
+                'p95_ms': _percentile(latencies, 95),
+                'p99_ms': _percentile(latencies, 99),
+                'max_ms': max(latencies, default=0.0),
+            }
+        requests = sum(user.sent for user in users)
+        return {
+            'users': len(users),
+            'roles': dict(Counter(roles)),
+            'server_threads': options['server_threads'],
+            'seconds': elapsed,
+            'requests': requests,
+            'requests_per_s': requests / elapsed,
+            'locked_errors': sum(locked.counts.values()),
+            'locked_rate': sum(locked.counts.values()) / requests if requests else 0.0,
+            'actions': actions,
+        }
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from theschool.attendance_utils import rebuild_attendance_summary
+
+
+class Command(BaseCommand):
+    help = "Rebuild the AttendanceDailySummary rollup from raw Attendance rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--school', type=int, help="Only rebuild this school's rows (by id).")
+
+    def handle(self, *args, **options):
+        written = rebuild_attendance_summary(school_id=options['school'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} attendance summary rows."))
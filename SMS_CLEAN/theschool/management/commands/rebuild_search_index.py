@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from theschool.search_utils import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index over students, teachers and support staff."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt."))
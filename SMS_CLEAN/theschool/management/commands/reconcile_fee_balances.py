@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from theschool.fee_utils import fee_ledger_mismatches, rebuild_fee_ledger
+from theschool.replica_utils import analytics_db, read_from
+
+
+class Command(BaseCommand):
+    help = "Check StudentFeeBalance and SchoolFeeTotal against raw FeeRecord rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help="Rebuild the ledger when it has drifted.")
+
+    def handle(self, *args, **options):
+        # The ledger and the records come from the same snapshot, so the check
+        # can run on the replica; --fix rebuilds on the primary.
+        with read_from(analytics_db()):
+            mismatches = fee_ledger_mismatches()
+        for what, stored, raw in mismatches:
+            self.stdout.write(
+                f"{what}: ledger due/paid {stored[0]}/{stored[1]}, records say {raw[0]}/{raw[1]}"
+            )
+
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS("Fee ledger matches the fee records."))
+        elif options['fix']:
+            rebuild_fee_ledger()
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt the fee ledger ({len(mismatches)} differences)."))
+        else:
+            raise CommandError(f"{len(mismatches)} ledger differences found; rerun with --fix to rebuild.")
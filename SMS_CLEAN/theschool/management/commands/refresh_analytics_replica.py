@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from theschool.replica_utils import MAX_LAG, refresh_replica, replica_configured
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary database into the 'analytics' replica with the SQLite backup API, "
+        "once or every --interval seconds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=MAX_LAG / 5,
+                            help="Seconds between refreshes; keep it well under ANALYTICS_MAX_LAG.")
+        parser.add_argument('--once', action='store_true', help="Refresh once and exit.")
+
+    def handle(self, *args, **options):
+        if not replica_configured():
+            raise CommandError("No 'analytics' database is configured; set ANALYTICS_DB.")
+
+        try:
+            while True:
+                seconds = refresh_replica()
+                self.stdout.write(f"Replica refreshed in {seconds * 1000:.0f} ms.")
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from theschool.campaign_utils import expand_campaigns
+from theschool.sms_utils import BATCH_SIZE, deliver_batch, get_backend, outbox_stats, release_stale_claims
+
+
+class Command(BaseCommand):
+    help = (
+        "Expand active campaigns into the outbox and deliver queued SMS in batches, "
+        "retrying failures with backoff."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help="Seconds to sleep when the queue is empty.")
+        parser.add_argument('--once', action='store_true',
+                            help="Drain what is due now, then exit instead of polling.")
+        parser.add_argument('--stats', action='store_true',
+                            help="Print queue depth and throughput counters and exit.")
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self._print_stats()
+            return
+
+        backend = get_backend()
+        totals = {'sent': 0, 'retried': 0, 'failed': 0}
+        started = time.monotonic()
+        try:
+            while True:
+                release_stale_claims()
+                expanded = expand_campaigns()
+                counts = deliver_batch(backend, options['batch_size'])
+                for key in totals:
+                    totals[key] += counts[key]
+                if counts['claimed']:
+                    elapsed = time.monotonic() - started
+                    self.stdout.write(
+                        f"batch: {counts['sent']} sent, {counts['retried']} retried, "
+                        f"{counts['failed']} failed | total sent {totals['sent']} "
+                        f"({totals['sent'] / elapsed:.1f}/s)"
+                    )
+                    continue
+                if expanded:
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Sent {totals['sent']}, retrying {totals['retried']}, gave up on {totals['failed']}."
+        ))
+        self._print_stats()
+
+    def _print_stats(self):
+        for key, value in outbox_stats().items():
+            self.stdout.write(f"{key}: {value}")
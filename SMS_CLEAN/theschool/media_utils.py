@@ -0,0 +1,81 @@
+# theschool/media_utils.py
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .image_utils import THUMBNAIL_SIZES, thumbnail_name
+from .models import StoredFile, Student, SupportStaff, Teacher
+from .storage import photo_storage
+
+# Every ImageField stored through photo_storage.
+PHOTO_FIELDS = {Student: 'passport_photo', Teacher: 'profile_photo', SupportStaff: 'profile_photo'}
+
+
+def add_reference(name):
+    if not name:
+        return
+    rows = StoredFile.objects.filter(name=name)
+    with transaction.atomic():
+        if rows.update(refs=F('refs') + 1):
+            return
+        try:
+            with transaction.atomic():
+                StoredFile.objects.create(name=name, refs=1)
+        except IntegrityError:
+            # A parallel upload of the same content created the row first.
+            rows.update(refs=F('refs') + 1)
+
+
+def delete_stored_file(name):
+    """Remove a photo and its thumbnail variants from disk."""
+    photo_storage.delete(name)
+    for size in THUMBNAIL_SIZES:
+        photo_storage.delete(thumbnail_name(name, size))
+
+
+def _delete_if_unreferenced(name):
+    # An identical upload may have taken the name again since the release;
+    # the row is checked and removed under the write lock before the file goes.
+    with transaction.atomic():
+        if StoredFile.objects.filter(name=name, refs__lte=0).delete()[0]:
+            delete_stored_file(name)
+
+
+def release_reference(name):
+    """
+    Drop one reference to `name`; when it was the last, the file and its
+    thumbnails are deleted once the transaction commits, unless the name has
+    been referenced again by then. Files stored before reference counting
+    (no StoredFile row) are left for dedupe_media.
+    """
+    if not name:
+        return
+    rows = StoredFile.objects.filter(name=name)
+    with transaction.atomic():
+        rows.update(refs=F('refs') - 1)
+        orphaned = rows.filter(refs__lte=0).exists()
+    if orphaned:
+        transaction.on_commit(lambda: _delete_if_unreferenced(name))
+
+
+def referenced_names():
+    """{name: number of rows pointing at it} across every photo field."""
+    counts = {}
+    for model, field in PHOTO_FIELDS.items():
+        rows = (
+            model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+            .order_by().values_list(field).annotate(n=Count('pk'))
+        )
+        for name, n in rows:
+            counts[name] = counts.get(name, 0) + n
+    return counts
+
+
+def rebuild_references():
+    """Recount StoredFile rows from the photo fields. Returns the number of files referenced."""
+    counts = referenced_names()
+    with transaction.atomic():
+        StoredFile.objects.all().delete()
+        StoredFile.objects.bulk_create(
+            [StoredFile(name=name, refs=n) for name, n in counts.items()], batch_size=500
+        )
+    return len(counts)
@@ -0,0 +1,306 @@
+# theschool/metrics_utils.py
+"""
+Per-view request metrics in Prometheus text format.
+
+RequestMetricsMiddleware times every request and every SQL query it runs,
+and records them under the URL name (the dotted view path for unnamed
+routes):
+
+  theschool_http_requests_total            requests by view, method, status
+  theschool_http_request_duration_seconds  wall time histogram
+  theschool_http_request_queries           SQL queries per request histogram
+  theschool_http_request_sql_seconds       time spent in SQL histogram
+  theschool_repeated_queries_total         requests that ran one statement
+                                           REPEATED_QUERY_THRESHOLD+ times
+                                           (N+1 suspects), by statement hash
+  theschool_budget_exceeded_total          requests over QUERY_BUDGET or
+                                           TIME_BUDGET
+
+Each process keeps its samples in memory and writes them to
+METRICS_DIR/metrics-<pid>-<random>.json at most every FLUSH_INTERVAL
+seconds; the random part keeps a later process that reuses the pid from
+overwriting an exited one's file. The /metrics view adds up the files of
+all processes, so every worker is counted whichever one answers the
+scrape. On each scrape the files of exited processes are folded into
+metrics-archive.json, so counters never go backwards and the directory
+holds one file per live worker plus the archive. Folding needs fcntl
+locks and assumes METRICS_DIR is not shared between hosts; without fcntl
+(Windows) the files are only summed, never folded.
+
+/metrics answers platform admins, requests carrying
+`Authorization: Bearer <METRICS_TOKEN>`, and addresses listed in
+METRICS_ALLOWED_IPS (empty unless configured).
+"""
+import hashlib
+import hmac
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+try:
+    import fcntl
+except ImportError:  # Windows: exited processes' files are kept as they are
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5.0)
+QUERY_BUDGET = getattr(settings, 'REQUEST_QUERY_BUDGET', 50)
+TIME_BUDGET = getattr(settings, 'REQUEST_TIME_BUDGET', 1.0)
+REPEATED_QUERY_THRESHOLD = getattr(settings, 'REPEATED_QUERY_THRESHOLD', 5)
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# name -> (type, help)
+FAMILIES = {
+    'theschool_http_requests_total': ('counter', "Requests served, by view, method and status code."),
+    'theschool_http_request_duration_seconds': ('histogram', "Wall time per request."),
+    'theschool_http_request_queries': ('histogram', "SQL queries per request."),
+    'theschool_http_request_sql_seconds': ('histogram', "Time spent in SQL per request."),
+    'theschool_repeated_queries_total': (
+        'counter', "Requests that ran one SQL statement repeatedly (N+1 suspects), by statement hash.",
+    ),
+    'theschool_budget_exceeded_total': ('counter', "Requests over the query-count or latency budget."),
+}
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+# metrics-<pid>.json is the name files had before the random part was added.
+_PROCESS_FILE = re.compile(r'^metrics-(\d+)(?:-[0-9a-f]+)?\.json$')
+ARCHIVE_NAME = 'metrics-archive.json'
+
+
+def metrics_dir():
+    """METRICS_DIR, read on every call so tests can point it at a scratch directory."""
+    return Path(getattr(settings, 'METRICS_DIR', settings.BASE_DIR / 'metrics'))
+
+
+def query_signature(sql):
+    """Short hash of a statement with its parameter lists collapsed, so `IN (%s, %s)` matches `IN (%s)`."""
+    return hashlib.sha1(_IN_LIST.sub('IN (...)', sql).encode('utf-8')).hexdigest()[:12]
+
+
+class MetricsRegistry:
+    """Samples keyed by (name, sorted label pairs); histograms are stored as their bucket/sum/count series."""
+
+    def __init__(self):
+        self.samples = Counter()
+        self.lock = threading.Lock()
+        self.last_flush = 0.0
+        self.pid = None
+        self.file_name = None
+
+    def inc(self, name, labels, amount=1):
+        with self.lock:
+            self.samples[(name, tuple(sorted(labels.items())))] += amount
+
+    def observe(self, name, labels, value, buckets):
+        with self.lock:
+            # Every bucket gets a series, zero or not, as Prometheus expects.
+            for bound in buckets:
+                self.samples[(f'{name}_bucket', tuple(sorted({**labels, 'le': str(bound)}.items())))] += int(value <= bound)
+            self.samples[(f'{name}_bucket', tuple(sorted({**labels, 'le': '+Inf'}.items())))] += 1
+            self.samples[(f'{name}_sum', tuple(sorted(labels.items())))] += value
+            self.samples[(f'{name}_count', tuple(sorted(labels.items())))] += 1
+
+    def flush(self, force=False):
+        """Write this process's samples to its file, at most every FLUSH_INTERVAL seconds unless forced."""
+        now = time.monotonic()
+        if not force and now - self.last_flush < FLUSH_INTERVAL:
+            return
+        with self.lock:
+            if self.pid != os.getpid():
+                # First flush, or a worker forked after the parent had flushed:
+                # the parent's samples stay in the parent's file.
+                if self.pid is not None:
+                    self.samples.clear()
+                self.pid = os.getpid()
+                self.file_name = f'metrics-{self.pid}-{uuid.uuid4().hex[:12]}.json'
+            self.last_flush = now
+            rows = [[name, dict(labels), value] for (name, labels), value in self.samples.items()]
+            file_name = self.file_name
+        directory = metrics_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        _write_rows(directory / file_name, rows)
+
+
+registry = MetricsRegistry()
+
+
+def _write_rows(path, rows):
+    partial = path.with_suffix('.tmp')
+    partial.write_text(json.dumps(rows))
+    partial.replace(path)
+
+
+def _read_samples(path, totals):
+    """Add the samples in `path` to `totals`; False when the file is missing or unreadable."""
+    try:
+        rows = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return False
+    for name, labels, value in rows:
+        totals[(name, tuple(sorted(labels.items())))] += value
+    return True
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # someone else's process
+    return True
+
+
+def _fold_exited(directory):
+    """Add the files of exited processes to the archive and delete them. Call with the lock held."""
+    exited = [
+        path for path in directory.glob('metrics-*.json')
+        if (match := _PROCESS_FILE.match(path.name)) and not _process_alive(int(match.group(1)))
+    ]
+    if not exited:
+        return
+    archive = directory / ARCHIVE_NAME
+    totals = Counter()
+    _read_samples(archive, totals)
+    # A dead process's file was written whole (write then rename), so it reads cleanly.
+    folded = [path for path in exited if _read_samples(path, totals)]
+    _write_rows(archive, [[name, dict(labels), value] for (name, labels), value in totals.items()])
+    for path in folded:
+        path.unlink(missing_ok=True)
+
+
+def scraper_allowed(request):
+    """True for requests with the METRICS_TOKEN bearer token or from a METRICS_ALLOWED_IPS address."""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    if token and hmac.compare_digest(header.encode(), f'Bearer {token}'.encode()):
+        return True
+    return request.META.get('REMOTE_ADDR') in getattr(settings, 'METRICS_ALLOWED_IPS', [])
+
+
+def collect():
+    """Samples of every process that has written a metrics file, added together."""
+    registry.flush(force=True)
+    directory = metrics_dir()
+    totals = Counter()
+    with open(directory / 'metrics.lock', 'a') as lock:
+        # Scrapes take turns, so no one reads an exited process's file and
+        # the archive that already holds it.
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            _fold_exited(directory)
+        for path in directory.glob('metrics-*.json'):
+            _read_samples(path, totals)
+    return totals
+
+
+def _family(sample_name):
+    for suffix in ('_bucket', '_sum', '_count'):
+        base = sample_name[:-len(suffix)]
+        if sample_name.endswith(suffix) and FAMILIES.get(base, ('',))[0] == 'histogram':
+            return base
+    return sample_name
+
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _bucket_order(item):
+    (name, labels), _ = item
+    le = dict(labels).get('le')
+    return (name, tuple(pair for pair in labels if pair[0] != 'le'), float(le) if le else 0.0)
+
+
+def render_prometheus(samples):
+    """Prometheus text exposition format (version 0.0.4) for `samples`."""
+    lines = []
+    families = {}
+    for item in sorted(samples.items(), key=_bucket_order):
+        families.setdefault(_family(item[0][0]), []).append(item)
+    for family in sorted(families):
+        kind, help_text = FAMILIES.get(family, ('untyped', ''))
+        lines.append(f'# HELP {family} {help_text}')
+        lines.append(f'# TYPE {family} {kind}')
+        for (name, labels), value in families[family]:
+            label_text = ','.join(f'{key}="{_escape(val)}"' for key, val in labels)
+            lines.append(f'{name}{{{label_text}}} {_format_value(value)}' if label_text else f'{name} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+class _QueryRecorder:
+    """execute_wrapper that counts and times every statement and groups them by signature."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+        self.sql = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+            signature = query_signature(sql)
+            self.statements[signature] += 1
+            self.sql.setdefault(signature, sql)
+
+
+class RequestMetricsMiddleware:
+    """Record wall time, query count, SQL time and repeated statements per URL name."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = _QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name if match else None) or '<unresolved>'
+        labels = {'view': view}
+        registry.inc('theschool_http_requests_total',
+                     {'view': view, 'method': request.method, 'status': str(response.status_code)})
+        registry.observe('theschool_http_request_duration_seconds', labels, elapsed, SECONDS_BUCKETS)
+        registry.observe('theschool_http_request_queries', labels, recorder.count, QUERY_BUCKETS)
+        registry.observe('theschool_http_request_sql_seconds', labels, recorder.seconds, SECONDS_BUCKETS)
+
+        for signature, times in recorder.statements.items():
+            if times >= REPEATED_QUERY_THRESHOLD:
+                registry.inc('theschool_repeated_queries_total', {'view': view, 'signature': signature})
+                logger.warning("%s ran one statement %d times (possible N+1) [%s]: %s",
+                               view, times, signature, recorder.sql[signature])
+        if recorder.count > QUERY_BUDGET:
+            registry.inc('theschool_budget_exceeded_total', {'view': view, 'budget': 'queries'})
+            logger.warning("%s ran %d SQL queries (budget %d)", view, recorder.count, QUERY_BUDGET)
+        if elapsed > TIME_BUDGET:
+            registry.inc('theschool_budget_exceeded_total', {'view': view, 'budget': 'latency'})
+            logger.warning("%s took %.0f ms (budget %.0f ms)", view, elapsed * 1000, TIME_BUDGET * 1000)
+
+        registry.flush()
+        return response
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def build_summary(apps, schema_editor):
+    Attendance = apps.get_model('theschool', 'Attendance')
+    AttendanceDailySummary = apps.get_model('theschool', 'AttendanceDailySummary')
+    grouped = (
+        Attendance.objects.order_by()
+        .values('student__school_id', 'student__stream_id', 'date')
+        .annotate(total=Count('pk'), present=Count('pk', filter=Q(status='Present')))
+    )
+    AttendanceDailySummary.objects.bulk_create(
+        [
+            AttendanceDailySummary(
+                school_id=row['student__school_id'],
+                stream_id=row['student__stream_id'],
+                date=row['date'],
+                present=row['present'],
+                total=row['total'],
+            )
+            for row in grouped
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('theschool', '0004_remove_teacher_name_remove_teacher_subject_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceDailySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('present', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('school', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='theschool.school')),
+                ('stream', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='theschool.stream')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['school', 'date'], name='attendance_summary_school_day')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('stream__isnull', False)), fields=('school', 'stream', 'date'), name='attendance_summary_unique_stream_day'), models.UniqueConstraint(condition=models.Q(('stream__isnull', True)), fields=('school', 'date'), name='attendance_summary_unique_school_day')],
+            },
+        ),
+        migrations.RunPython(build_summary, migrations.RunPython.noop),
+    ]
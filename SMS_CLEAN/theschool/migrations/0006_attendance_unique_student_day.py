@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:34
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Q
+
+
+def remove_duplicate_attendance(apps, schema_editor):
+    """Keep the latest row for each (student, date) and rebuild the rollup if anything went."""
+    Attendance = apps.get_model('theschool', 'Attendance')
+    AttendanceDailySummary = apps.get_model('theschool', 'AttendanceDailySummary')
+
+    duplicates = (
+        Attendance.objects.order_by()
+        .values('student_id', 'date')
+        .annotate(n=Count('pk'), keep=Max('pk'))
+        .filter(n__gt=1)
+    )
+    removed = 0
+    for row in duplicates:
+        removed += Attendance.objects.filter(
+            student_id=row['student_id'], date=row['date']
+        ).exclude(pk=row['keep']).delete()[0]
+    if not removed:
+        return
+
+    AttendanceDailySummary.objects.all().delete()
+    grouped = (
+        Attendance.objects.order_by()
+        .values('student__school_id', 'student__stream_id', 'date')
+        .annotate(total=Count('pk'), present=Count('pk', filter=Q(status='Present')))
+    )
+    AttendanceDailySummary.objects.bulk_create(
+        [
+            AttendanceDailySummary(
+                school_id=row['student__school_id'],
+                stream_id=row['student__stream_id'],
+                date=row['date'],
+                present=row['present'],
+                total=row['total'],
+            )
+            for row in grouped
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('theschool', '0005_attendancedailysummary'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_attendance, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='attendance',
+            constraint=models.UniqueConstraint(fields=('student', 'date'), name='attendance_unique_student_day'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('theschool', '0006_attendance_unique_student_day'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['date'], name='attendance_date'),
+        ),
+        migrations.AddIndex(
+            model_name='feerecord',
+            index=models.Index(fields=['student', 'term'], name='feerecord_student_term'),
+        ),
+        migrations.AddIndex(
+            model_name='lessonplan',
+            index=models.Index(fields=['teacher', 'created_at'], name='lessonplan_teacher_created'),
+        ),
+        migrations.AddIndex(
+            model_name='stream',
+            index=models.Index(fields=['school', 'name'], name='stream_school_name'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['school', 'gender'], name='student_school_gender'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['school', 'stream'], name='student_school_stream'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['school', 'role'], name='user_school_role'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['role'], name='user_role'),
+        ),
+    ]
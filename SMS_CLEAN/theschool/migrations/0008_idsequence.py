@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('theschool', '0007_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('student', 'Student'), ('teacher', 'Teacher'), ('staff', 'Support Staff')], max_length=20)),
+                ('last_value', models.PositiveIntegerField(default=0)),
+                ('school', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='theschool.school')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('school', 'kind'), name='idsequence_unique_school_kind')],
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('theschool', '0008_idsequence'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['school', 'last_name'], name='student_school_last_name'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['school', 'registration_number'], name='student_school_reg_no'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['school', 'grade'], name='student_school_grade'),
+        ),
+        migrations.AddIndex(
+            model_name='supportstaff',
+            index=models.Index(fields=['school', 'name'], name='supportstaff_school_name'),
+        ),
+        migrations.AddIndex(
+            model_name='supportstaff',
+            index=models.Index(fields=['school', 'role'], name='supportstaff_school_role'),
+        ),
+        migrations.AddIndex(
+            model_name='teacher',
+            index=models.Index(fields=['school', 'last_name'], name='teacher_school_last_name'),
+        ),
+        migrations.AddIndex(
+            model_name='teacher',
+            index=models.Index(fields=['school', 'teacher_id'], name='teacher_school_teacher_id'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['school', 'username'], name='user_school_username'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('theschool', '0009_list_sort_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='school',
+            index=models.Index(fields=['name'], name='school_name'),
+        ),
+        migrations.AddIndex(
+            model_name='school',
+            index=models.Index(fields=['created_at'], name='school_created_at'),
+        ),
+    ]
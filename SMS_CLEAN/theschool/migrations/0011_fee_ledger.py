@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def build_ledger(apps, schema_editor):
+    FeeRecord = apps.get_model('theschool', 'FeeRecord')
+    StudentFeeBalance = apps.get_model('theschool', 'StudentFeeBalance')
+    SchoolFeeTotal = apps.get_model('theschool', 'SchoolFeeTotal')
+
+    students = (
+        FeeRecord.objects.order_by()
+        .values('student_id')
+        .annotate(due=Sum('amount_due'), paid=Sum('amount_paid'))
+    )
+    StudentFeeBalance.objects.bulk_create(
+        [
+            StudentFeeBalance(student_id=row['student_id'], total_due=row['due'], total_paid=row['paid'])
+            for row in students
+        ],
+        batch_size=500,
+    )
+    schools = (
+        FeeRecord.objects.order_by()
+        .values('student__school_id', 'term')
+        .annotate(due=Sum('amount_due'), paid=Sum('amount_paid'))
+    )
+    SchoolFeeTotal.objects.bulk_create(
+        [
+            SchoolFeeTotal(
+                school_id=row['student__school_id'], term=row['term'],
+                total_due=row['due'], total_paid=row['paid'],
+            )
+            for row in schools
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('theschool', '0010_school_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentFeeBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_due', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_paid', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='fee_balance', to='theschool.student')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SchoolFeeTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=20)),
+                ('total_due', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_paid', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('school', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='theschool.school')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('school', 'term'), name='schoolfeetotal_unique_school_term')],
+            },
+        ),
+        migrations.RunPython(build_ledger, migrations.RunPython.noop),
+    ]
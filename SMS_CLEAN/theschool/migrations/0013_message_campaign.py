@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('theschool', '0012_outbound_message'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageCampaign',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('audience', models.CharField(choices=[('fee_reminder', 'Parents with an outstanding fee balance'), ('attendance_reminder', 'Parents of students absent this week'), ('all_parents', 'All parents')], max_length=30)),
+                ('template', models.TextField()),
+                ('rate_per_minute', models.PositiveIntegerField(default=600)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('cancelled', 'Cancelled')], default='queued', max_length=10)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('queued', models.PositiveIntegerField(default=0)),
+                ('last_student_id', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('school', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='theschool.school')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='outboundmessage',
+            name='campaign',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='theschool.messagecampaign'),
+        ),
+        migrations.AddIndex(
+            model_name='outboundmessage',
+            index=models.Index(fields=['campaign', 'status'], name='outbox_campaign_status'),
+        ),
+        migrations.AddIndex(
+            model_name='messagecampaign',
+            index=models.Index(fields=['status', 'created_at'], name='campaign_status_created'),
+        ),
+        migrations.AddIndex(
+            model_name='messagecampaign',
+            index=models.Index(fields=['school', 'created_at'], name='campaign_school_created'),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:30
+
+from django.db import migrations
+
+
+CREATE_INDEX = [
+    """
+    CREATE VIRTUAL TABLE theschool_searchindex USING fts5(
+        school, kind, title, ref, body,
+        prefix='2 3',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    "CREATE VIRTUAL TABLE theschool_searchindex_vocab USING fts5vocab(theschool_searchindex, 'col')",
+]
+
+DROP_INDEX = [
+    "DROP TABLE IF EXISTS theschool_searchindex_vocab",
+    "DROP TABLE IF EXISTS theschool_searchindex",
+]
+
+
+# Frozen copy of the documents search_utils builds, so later changes there
+# never change what this migration runs.
+DIGITS = "replace(replace(COALESCE({}, ''), ' ', ''), '-', '')"
+
+BACKFILL = [
+    f"""
+    INSERT INTO theschool_searchindex (rowid, school, kind, title, ref, body)
+    SELECT s.id * 4 + 1, 's' || s.school_id, 'student',
+           s.first_name || ' ' || s.last_name,
+           s.registration_number,
+           COALESCE(s.grade, '') || ' ' ||
+           COALESCE(p.father_name, '') || ' ' || {DIGITS.format('p.father_phone')} || ' ' ||
+           COALESCE(p.mother_name, '') || ' ' || {DIGITS.format('p.mother_phone')} || ' ' ||
+           COALESCE(g.full_name, '') || ' ' || {DIGITS.format('g.phone')} || ' ' ||
+           COALESCE(u.first_name, '') || ' ' || COALESCE(u.last_name, '') || ' ' ||
+           {DIGITS.format('u.phone_number')}
+    FROM theschool_student s
+    LEFT JOIN theschool_parentdetails p ON p.student_id = s.id
+    LEFT JOIN theschool_guardiandetails g ON g.student_id = s.id
+    LEFT JOIN theschool_user u ON u.id = s.parent_id
+    """,
+    f"""
+    INSERT INTO theschool_searchindex (rowid, school, kind, title, ref, body)
+    SELECT t.id * 4 + 2, 's' || t.school_id, 'teacher',
+           t.first_name || ' ' || t.last_name,
+           t.teacher_id,
+           COALESCE(t.subjects, '') || ' ' || {DIGITS.format('t.national_id')}
+    FROM theschool_teacher t
+    """,
+    f"""
+    INSERT INTO theschool_searchindex (rowid, school, kind, title, ref, body)
+    SELECT st.id * 4 + 3, 's' || st.school_id, 'staff',
+           st.name,
+           COALESCE(st.working_id, ''),
+           COALESCE(st.role, '') || ' ' || {DIGITS.format('st.national_id')}
+    FROM theschool_supportstaff st
+    """,
+    "INSERT INTO theschool_searchindex (theschool_searchindex) VALUES ('optimize')",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('theschool', '0013_message_campaign'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_INDEX, DROP_INDEX),
+        migrations.RunSQL(BACKFILL, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:55
+
+import theschool.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('theschool', '0014_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('refs', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='student',
+            name='passport_photo',
+            field=models.ImageField(blank=True, null=True, storage=theschool.storage.get_photo_storage, upload_to='student_photos/'),
+        ),
+        migrations.AlterField(
+            model_name='supportstaff',
+            name='profile_photo',
+            field=models.ImageField(blank=True, null=True, storage=theschool.storage.get_photo_storage, upload_to='staff_photos/'),
+        ),
+        migrations.AlterField(
+            model_name='teacher',
+            name='profile_photo',
+            field=models.ImageField(blank=True, null=True, storage=theschool.storage.get_photo_storage, upload_to='teacher_photos/'),
+        ),
+    ]
@@ -1,15 +1,42 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 
+from .storage import get_photo_storage
+
 class School(models.Model):
     name = models.CharField(max_length=255)
     address = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['name'], name='school_name'),
+            models.Index(fields=['created_at'], name='school_created_at'),
+        ]
+
     def __str__(self):
         return self.name
 
+class IdSequence(models.Model):
+    """Last number handed out per school for each kind of generated ID."""
+    KIND_CHOICES = (
+        ('student', 'Student'),
+        ('teacher', 'Teacher'),
+        ('staff', 'Support Staff'),
+    )
+    school = models.ForeignKey(School, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    last_value = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['school', 'kind'], name='idsequence_unique_school_kind'),
+        ]
+
+    def __str__(self):
+        return f"{self.school} - {self.kind}: {self.last_value}"
+
 class User(AbstractUser):
     ROLE_CHOICES = (
         ('admin', 'Admin'),
@@ -22,6 +49,13 @@ class User(AbstractUser):
     phone_number = models.CharField(max_length=20, blank=True)
     is_platform_admin = models.BooleanField(default=False)
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['school', 'role'], name='user_school_role'),
+            models.Index(fields=['role'], name='user_role'),
+            models.Index(fields=['school', 'username'], name='user_school_username'),
+        ]
+
     def __str__(self):
         return f"{self.username} ({self.role})"
 
@@ -29,6 +63,11 @@ class Stream(models.Model):
     name = models.CharField(max_length=50)
     school = models.ForeignKey(School, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['school', 'name'], name='stream_school_name'),
+        ]
+
     def __str__(self):
         return f"{self.name} - {self.school.name}"
 
@@ -43,19 +82,33 @@ class Student(models.Model):
     religion = models.CharField(max_length=50, blank=True, default='None')
     grade = models.CharField(max_length=50, default='Grade 1')
     stream = models.ForeignKey(Stream, on_delete=models.SET_NULL, null=True, default=1)
-    passport_photo = models.ImageField(upload_to='student_photos/', blank=True, null=True)
+    passport_photo = models.ImageField(upload_to='student_photos/', storage=get_photo_storage, blank=True, null=True)
     registration_number = models.CharField(max_length=20, unique=True, editable=False, default='TEMP0000')
     parent = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['school', 'gender'], name='student_school_gender'),
+            models.Index(fields=['school', 'stream'], name='student_school_stream'),
+            models.Index(fields=['school', 'last_name'], name='student_school_last_name'),
+            models.Index(fields=['school', 'registration_number'], name='student_school_reg_no'),
+            models.Index(fields=['school', 'grade'], name='student_school_grade'),
+        ]
+
     def calculate_age(self):
         return timezone.now().year - self.date_of_birth.year
 
     def save(self, *args, **kwargs):
-        if not self.registration_number or self.registration_number == 'TEMP0000':
-            initials = self.first_name[0] + self.last_name[0]
-            count = Student.objects.filter(school=self.school).count() + 1
-            self.registration_number = f"{initials.upper()}{self.school.id:03d}{count:04d}"
-        super().save(*args, **kwargs)
+        # pre_save moves the student's attendance rollup and fee totals when the
+        # school or stream changes; a failed save must take those moves back.
+        with transaction.atomic():
+            if not self.registration_number or self.registration_number == 'TEMP0000':
+                from .id_utils import format_registration_number, reserve_numbers
+                number = reserve_numbers(self.school_id, 'student')[0]
+                self.registration_number = format_registration_number(
+                    self.first_name, self.last_name, self.school_id, number
+                )
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
@@ -87,9 +140,45 @@ class Attendance(models.Model):
     date = models.DateField()
     status = models.CharField(max_length=10, choices=STATUS_CHOICES)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'date'], name='attendance_unique_student_day'),
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='attendance_date'),
+        ]
+
     def __str__(self):
         return f"{self.student} - {self.date} - {self.status}"
 
+class AttendanceDailySummary(models.Model):
+    """Present/total attendance per (school, stream, date), kept in step with Attendance."""
+    school = models.ForeignKey(School, on_delete=models.CASCADE)
+    stream = models.ForeignKey(Stream, on_delete=models.CASCADE, null=True, blank=True)
+    date = models.DateField()
+    present = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['school', 'stream', 'date'],
+                condition=models.Q(stream__isnull=False),
+                name='attendance_summary_unique_stream_day',
+            ),
+            models.UniqueConstraint(
+                fields=['school', 'date'],
+                condition=models.Q(stream__isnull=True),
+                name='attendance_summary_unique_school_day',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['school', 'date'], name='attendance_summary_school_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.school} - {self.date}: {self.present}/{self.total}"
+
 class FeeRecord(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
     term = models.CharField(max_length=20)
@@ -97,18 +186,74 @@ class FeeRecord(models.Model):
     amount_paid = models.DecimalField(max_digits=10, decimal_places=2)
     paid_on = models.DateField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['student', 'term'], name='feerecord_student_term'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # The fee ledger is updated from post_save; keep both in one transaction.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+
     def __str__(self):
         return f"{self.student} - {self.term}"
 
+class StudentFeeBalance(models.Model):
+    """Running fee totals for one student, kept in step with FeeRecord."""
+    student = models.OneToOneField(Student, on_delete=models.CASCADE, related_name='fee_balance')
+    total_due = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_paid = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def balance(self):
+        return self.total_due - self.total_paid
+
+    def __str__(self):
+        return f"{self.student}: KES {self.balance}"
+
+class SchoolFeeTotal(models.Model):
+    """Fee totals per school and term, kept in step with FeeRecord."""
+    school = models.ForeignKey(School, on_delete=models.CASCADE)
+    term = models.CharField(max_length=20)
+    total_due = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_paid = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['school', 'term'], name='schoolfeetotal_unique_school_term'),
+        ]
+
+    def __str__(self):
+        return f"{self.school} - {self.term}"
+
 class LessonPlan(models.Model):
     teacher = models.ForeignKey(User, on_delete=models.CASCADE)
     title = models.CharField(max_length=255)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['teacher', 'created_at'], name='lessonplan_teacher_created'),
+        ]
+
     def __str__(self):
         return self.title
 
+class StoredFile(models.Model):
+    """Reference count for a content-addressed photo shared by any number of rows."""
+    name = models.CharField(max_length=255, unique=True)
+    refs = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} ({self.refs})"
+
 class PlatformConfig(models.Model):
     platform_name = models.CharField(max_length=100, default='PlotiYako')
     admin_email = models.EmailField(default='admin@example.com')
@@ -122,14 +267,20 @@ class Teacher(models.Model):
     last_name = models.CharField(max_length=100, default='Doe')
     national_id = models.CharField(max_length=20, default='00000000')
     teacher_id = models.CharField(max_length=20, unique=True, editable=False, default='TEMP-TID')
-    profile_photo = models.ImageField(upload_to='teacher_photos/', blank=True, null=True)
+    profile_photo = models.ImageField(upload_to='teacher_photos/', storage=get_photo_storage, blank=True, null=True)
     subjects = models.CharField(max_length=255, default='General Studies')  # Comma-separated list
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['school', 'last_name'], name='teacher_school_last_name'),
+            models.Index(fields=['school', 'teacher_id'], name='teacher_school_teacher_id'),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.teacher_id or self.teacher_id == 'TEMP-TID':
-            initials = self.first_name[0] + self.last_name[0]
-            count = Teacher.objects.filter(school=self.school).count() + 1
-            self.teacher_id = f"T{initials.upper()}{self.school.id:03d}{count:04d}"
+            from .id_utils import format_teacher_id, reserve_numbers
+            number = reserve_numbers(self.school_id, 'teacher')[0]
+            self.teacher_id = format_teacher_id(self.first_name, self.last_name, self.school_id, number)
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -142,7 +293,92 @@ class SupportStaff(models.Model):
     school = models.ForeignKey(School, on_delete=models.CASCADE)
     working_id = models.CharField(max_length=20, unique=True, null=True, blank=True)
     national_id = models.CharField(max_length=20, null=True, blank=True)
-    profile_photo = models.ImageField(upload_to='staff_photos/', blank=True, null=True)
+    profile_photo = models.ImageField(upload_to='staff_photos/', storage=get_photo_storage, blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['school', 'name'], name='supportstaff_school_name'),
+            models.Index(fields=['school', 'role'], name='supportstaff_school_role'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self.working_id:
+            from .id_utils import format_working_id, reserve_numbers
+            number = reserve_numbers(self.school_id, 'staff')[0]
+            self.working_id = format_working_id(self.name, self.school_id, number)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.name} ({self.working_id})"
+
+
+class MessageCampaign(models.Model):
+    """A bulk SMS to every parent in an audience; expanded into the outbox in batches."""
+    AUDIENCE_CHOICES = [
+        ('fee_reminder', 'Parents with an outstanding fee balance'),
+        ('attendance_reminder', 'Parents of students absent this week'),
+        ('all_parents', 'All parents'),
+    ]
+    QUEUED, RUNNING, DONE, CANCELLED = 'queued', 'running', 'done', 'cancelled'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (CANCELLED, 'Cancelled'),
+    ]
+
+    school = models.ForeignKey(School, on_delete=models.CASCADE, null=True, blank=True)  # null: every school
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    audience = models.CharField(max_length=30, choices=AUDIENCE_CHOICES)
+    template = models.TextField()
+    rate_per_minute = models.PositiveIntegerField(default=600)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    total = models.PositiveIntegerField(default=0)
+    queued = models.PositiveIntegerField(default=0)
+    last_student_id = models.BigIntegerField(default=0)  # keyset cursor into the recipients
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='campaign_status_created'),
+            models.Index(fields=['school', 'created_at'], name='campaign_school_created'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_audience_display()} ({self.status})"
+
+
+class OutboundMessage(models.Model):
+    """An SMS waiting in (or sent from) the outbox; delivered by the send_outbox worker."""
+    PENDING, SENDING, SENT, FAILED = 'pending', 'sending', 'sent', 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (SENDING, 'Sending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    ]
+
+    school = models.ForeignKey(School, on_delete=models.CASCADE, null=True, blank=True)
+    campaign = models.ForeignKey(MessageCampaign, on_delete=models.SET_NULL, null=True, blank=True, db_index=False)
+    phone_number = models.CharField(max_length=20)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_by = models.CharField(max_length=40, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_next_attempt'),
+            models.Index(fields=['claimed_by'], name='outbox_claimed_by'),
+            models.Index(fields=['status', 'sent_at'], name='outbox_status_sent_at'),
+            models.Index(fields=['campaign', 'status'], name='outbox_campaign_status'),
+        ]
+
+    def __str__(self):
+        return f"{self.phone_number} ({self.status})"
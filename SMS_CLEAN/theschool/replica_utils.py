@@ -0,0 +1,131 @@
+# theschool/replica_utils.py
+"""
+Optional read replica for reporting. When settings.DATABASES has an
+'analytics' alias, heavy read-only views and jobs read from it and leave
+the primary to transactional writes. The replica is a copy of the primary
+made with SQLite's online backup API (`manage.py refresh_analytics_replica`).
+
+Reads only go to the replica when it is safe:
+  * a user who has written something reads from the primary until the
+    replica has been refreshed past that write (read-your-writes);
+  * nobody reads from a replica older than ANALYTICS_MAX_LAG seconds.
+
+Views opt in with @use_analytics; other code picks the alias with
+analytics_db() and passes it to .using(). Writes always go to the primary.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, transaction
+
+ANALYTICS = 'analytics'
+MAX_LAG = getattr(settings, 'ANALYTICS_MAX_LAG', 300)
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+SESSION_KEY = '_last_write_at'
+# Written into the replica after each copy; the primary has no such table.
+STATUS_TABLE = 'replica_status'
+
+_read_alias = ContextVar('read_alias', default=None)
+
+
+def replica_configured():
+    return ANALYTICS in settings.DATABASES
+
+
+def replica_refreshed_at():
+    """Unix time of the primary snapshot the replica holds, or None if it was never refreshed."""
+    with connections[ANALYTICS].cursor() as cursor:
+        try:
+            cursor.execute(f"SELECT refreshed_at FROM {STATUS_TABLE}")
+        except DatabaseError:
+            return None
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def analytics_db(request=None):
+    """
+    The alias reporting reads should use: 'analytics' when the replica is
+    configured, fresh enough and (given a request) already holds the
+    user's last write; otherwise the primary.
+    """
+    if not replica_configured():
+        return DEFAULT_DB_ALIAS
+    refreshed_at = replica_refreshed_at()
+    if refreshed_at is None or time.time() - refreshed_at > MAX_LAG:
+        return DEFAULT_DB_ALIAS
+    session = getattr(request, 'session', None)
+    if session is not None and session.get(SESSION_KEY, 0) >= refreshed_at:
+        return DEFAULT_DB_ALIAS
+    return ANALYTICS
+
+
+@contextmanager
+def read_from(alias):
+    """Route every ORM read inside the block to `alias`."""
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def use_analytics(view):
+    """Run a read-only view's queries (including template rendering) against analytics_db(request)."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with read_from(analytics_db(request)):
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class AnalyticsRouter:
+    """Sends reads inside read_from() to its alias and every write to the primary."""
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same rows.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema with the data, from the backup.
+        return db != ANALYTICS
+
+
+class PrimaryPinMiddleware:
+    """Remember when a session last sent a write, so analytics_db() keeps its reads on the primary."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS and replica_configured() and hasattr(request, 'session'):
+            request.session[SESSION_KEY] = time.time()
+        return response
+
+
+def refresh_replica():
+    """
+    Copy the primary into the replica with the SQLite backup API and record
+    when the snapshot was taken. Readers on the replica keep working while
+    it is copied. Returns the seconds the copy took.
+    """
+    source, target = connections[DEFAULT_DB_ALIAS], connections[ANALYTICS]
+    source.ensure_connection()
+    target.ensure_connection()
+    # Anything committed before this moment is in the copy.
+    started = time.time()
+    source.connection.backup(target.connection)
+    with transaction.atomic(using=ANALYTICS), target.cursor() as cursor:
+        cursor.execute(f"CREATE TABLE {STATUS_TABLE} (refreshed_at REAL NOT NULL)")
+        cursor.execute(f"INSERT INTO {STATUS_TABLE} (refreshed_at) VALUES (%s)", [started])
+    return time.time() - started
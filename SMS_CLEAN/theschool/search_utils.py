@@ -0,0 +1,210 @@
+# theschool/search_utils.py
+"""
+Full-text search over students (with their parents/guardians), teachers and
+support staff, backed by the SQLite FTS5 table `theschool_searchindex`
+(created in migration 0014).
+
+Every row is addressed by rowid = pk * 4 + kind code, so re-indexing or
+removing an object touches exactly one row. The `school` column holds a
+token like "s12" and is matched inside FTS, so per-school scoping never
+leaves the index.
+"""
+import re
+
+from django.db import connection
+
+TABLE = 'theschool_searchindex'
+VOCAB = 'theschool_searchindex_vocab'
+KINDS = {'student': 1, 'teacher': 2, 'staff': 3}
+RESULT_LIMIT = 10
+MIN_QUERY_LENGTH = 2
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+_SPLIT_NUMBER = re.compile(r'(?<=\d)[\s-]+(?=\d)')
+
+
+def _digits(column):
+    """SQL for a phone/ID column with spaces and dashes removed, so '0712 345 678' is one token."""
+    return f"replace(replace(COALESCE({column}, ''), ' ', ''), '-', '')"
+
+
+# kind -> INSERT ... SELECT that (re)builds the documents for the ids in the WHERE clause.
+_INSERT = {
+    'student': f"""
+        INSERT INTO {TABLE} (rowid, school, kind, title, ref, body)
+        SELECT s.id * 4 + 1, 's' || s.school_id, 'student',
+               s.first_name || ' ' || s.last_name,
+               s.registration_number,
+               COALESCE(s.grade, '') || ' ' ||
+               COALESCE(p.father_name, '') || ' ' || {_digits('p.father_phone')} || ' ' ||
+               COALESCE(p.mother_name, '') || ' ' || {_digits('p.mother_phone')} || ' ' ||
+               COALESCE(g.full_name, '') || ' ' || {_digits('g.phone')} || ' ' ||
+               COALESCE(u.first_name, '') || ' ' || COALESCE(u.last_name, '') || ' ' ||
+               {_digits('u.phone_number')}
+        FROM theschool_student s
+        LEFT JOIN theschool_parentdetails p ON p.student_id = s.id
+        LEFT JOIN theschool_guardiandetails g ON g.student_id = s.id
+        LEFT JOIN theschool_user u ON u.id = s.parent_id
+    """,
+    'teacher': f"""
+        INSERT INTO {TABLE} (rowid, school, kind, title, ref, body)
+        SELECT t.id * 4 + 2, 's' || t.school_id, 'teacher',
+               t.first_name || ' ' || t.last_name,
+               t.teacher_id,
+               COALESCE(t.subjects, '') || ' ' || {_digits('t.national_id')}
+        FROM theschool_teacher t
+    """,
+    'staff': f"""
+        INSERT INTO {TABLE} (rowid, school, kind, title, ref, body)
+        SELECT st.id * 4 + 3, 's' || st.school_id, 'staff',
+               st.name,
+               COALESCE(st.working_id, ''),
+               COALESCE(st.role, '') || ' ' || {_digits('st.national_id')}
+        FROM theschool_supportstaff st
+    """,
+}
+_ALIAS = {'student': 's', 'teacher': 't', 'staff': 'st'}
+
+
+def remove_from_index(kind, pks):
+    pks = list(pks)
+    if not pks:
+        return
+    code = KINDS[kind]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {TABLE} WHERE rowid IN ({', '.join(['%s'] * len(pks))})",
+            [pk * 4 + code for pk in pks],
+        )
+
+
+def index_objects(kind, pks):
+    """(Re)build the search documents for the given primary keys of one kind."""
+    pks = list(pks)
+    if not pks:
+        return
+    remove_from_index(kind, pks)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            _INSERT[kind] + f" WHERE {_ALIAS[kind]}.id IN ({', '.join(['%s'] * len(pks))})",
+            pks,
+        )
+
+
+def rebuild_search_index():
+    """Drop every document and index all students, teachers and staff again."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE}")
+        for sql in _INSERT.values():
+            cursor.execute(sql)
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+
+
+def _tokens(query):
+    return [token.lower() for token in _TOKEN.findall(_SPLIT_NUMBER.sub('', query))]
+
+
+def _one_edit_apart(a, b):
+    """True when b is within one insertion, deletion, substitution or swap."""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) == len(b):
+        diff = [i for i in range(len(a)) if a[i] != b[i]]
+        return len(diff) == 1 or (
+            len(diff) == 2 and diff[1] == diff[0] + 1
+            and a[diff[0]] == b[diff[1]] and a[diff[1]] == b[diff[0]]
+        )
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1:]
+
+
+def _near_terms(cursor, token, partial):
+    """
+    Index terms within one edit of `token`. For the word still being typed
+    (`partial`), returns the term prefixes within one edit instead, to be
+    matched as prefixes themselves.
+    Candidates are read from a few two-letter ranges of the vocabulary (the
+    token's own start, its first two letters swapped and its second letter
+    dropped) rather than the whole term list; typos after the first two
+    letters, the common case, are always covered.
+    """
+    terms = set()
+    for start in {token[:2], token[1] + token[0], token[0] + token[2]}:
+        # One range per query: fts5vocab only seeks on a single term range.
+        cursor.execute(
+            f"SELECT term FROM {VOCAB} WHERE term >= %s AND term < %s AND col IN ('title', 'ref', 'body')",
+            [start, start + '\uffff'],
+        )
+        terms.update(term for (term,) in cursor.fetchall())
+
+    checked = {}  # many terms share a prefix (kariuki, kariuki12, ...); test each once
+
+    def close(candidate):
+        if candidate not in checked:
+            checked[candidate] = _one_edit_apart(token, candidate)
+        return checked[candidate]
+
+    if partial:
+        lengths = range(len(token) - 1, len(token) + 2)
+        near = {term[:n] for term in terms for n in lengths if close(term[:n])}
+    else:
+        near = {term for term in terms if close(term)}
+    return sorted(near)[:50]
+
+
+def _quote(term):
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _match_expression(school_id, clauses):
+    scope = f'school : {_quote(f"s{school_id}")} AND ' if school_id is not None else ''
+    return scope + '{title ref body} : (' + ' AND '.join(clauses) + ')'
+
+
+def _run(cursor, expression, kinds, limit):
+    sql = f"SELECT kind, rowid / 4, title, ref, school FROM {TABLE} WHERE {TABLE} MATCH %s"
+    params = [expression]
+    if kinds:
+        sql += f" AND kind IN ({', '.join(['%s'] * len(kinds))})"
+        params += list(kinds)
+    sql += f" ORDER BY bm25({TABLE}, 0, 0, 10.0, 5.0, 1.0) LIMIT %s"
+    cursor.execute(sql, params + [limit])
+    return [
+        {'kind': kind, 'id': pk, 'title': title, 'ref': ref, 'school_id': int(school[1:])}
+        for kind, pk, title, ref, school in cursor.fetchall()
+    ]
+
+
+def search(school_id, query, kinds=None, limit=RESULT_LIMIT):
+    """
+    Ranked matches for `query` among the school's people (every school when
+    school_id is None). Each word matches as a prefix; when that finds
+    nothing, words are widened to index terms one typo away. Returns
+    [{'kind', 'id', 'title', 'ref', 'school_id'}, ...].
+    """
+    tokens = _tokens(query)
+    if not tokens or sum(len(token) for token in tokens) < MIN_QUERY_LENGTH:
+        return []
+
+    with connection.cursor() as cursor:
+        results = _run(
+            cursor, _match_expression(school_id, [_quote(token) + ' *' for token in tokens]), kinds, limit
+        )
+        if results:
+            return results
+
+        clauses = []
+        for position, token in enumerate(tokens):
+            partial = position == len(tokens) - 1
+            alternatives = [_quote(token) + ' *']
+            if len(token) >= 3:
+                suffix = ' *' if partial else ''
+                alternatives += [_quote(term) + suffix for term in _near_terms(cursor, token, partial)]
+            clauses.append('(' + ' OR '.join(alternatives) + ')')
+        return _run(cursor, _match_expression(school_id, clauses), kinds, limit)
@@ -0,0 +1,233 @@
+# theschool/seed_utils.py
+"""
+Synthetic schools for load testing and benchmarks.
+
+generate_school() writes one school with bulk inserts: an admin, teachers
+(staff records and logins), support staff, streams, parents, students with
+parent details, a weekday Attendance row per student for `days` days back
+from today, and a FeeRecord per student per term. bulk_create sends no
+signals, so callers finish with finish_generation(), which rebuilds the
+attendance rollup, the fee ledger and the search index from the raw rows.
+
+Every login gets DEMO_PASSWORD. The data is random but repeatable for a
+given seed. The benchmark and load-test commands generate it inside
+scratch_database(), never into db.sqlite3.
+"""
+import random
+from contextlib import contextmanager
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from .attendance_utils import rebuild_attendance_summary
+from .fee_utils import rebuild_fee_ledger
+from .id_utils import (
+    format_registration_number, format_teacher_id, format_working_id, reserve_numbers,
+)
+from .models import (
+    Attendance, FeeRecord, ParentDetails, School, Stream, Student, SupportStaff, Teacher, User,
+)
+from .replica_utils import replica_configured
+from .search_utils import rebuild_search_index
+
+DEMO_PASSWORD = 'demo-pass'
+BATCH_SIZE = 2000
+
+GRADES = ["Grade 1", "Grade 2", "Grade 3", "Grade 4", "Grade 5", "Grade 6"]
+STREAM_NAMES = ['East', 'West', 'North', 'South']
+TERMS = ['Term 1', 'Term 2', 'Term 3']
+TERM_FEE = Decimal('15000.00')
+STUDENTS_PER_TEACHER = 35
+STUDENTS_PER_PARENT = 1.6  # siblings share a parent login
+PRESENT_RATE = 0.92
+
+FIRST_NAMES = [
+    'Amani', 'Baraka', 'Chege', 'Daudi', 'Esther', 'Faith', 'Grace', 'Hassan', 'Imani', 'Juma',
+    'Kamau', 'Lilian', 'Mercy', 'Njeri', 'Otieno', 'Pendo', 'Rehema', 'Said', 'Tumaini', 'Wanjiru',
+    'Akinyi', 'Brian', 'Cynthia', 'Dennis', 'Eunice', 'Felix', 'Halima', 'Ivy', 'Kevin', 'Zawadi',
+]
+LAST_NAMES = [
+    'Achieng', 'Chebet', 'Kariuki', 'Kiprop', 'Macharia', 'Mutua', 'Mwangi', 'Njoroge', 'Odhiambo',
+    'Ochieng', 'Omondi', 'Onyango', 'Wafula', 'Wambui', 'Wekesa', 'Kilonzo', 'Kimani', 'Nyambura',
+]
+OCCUPATIONS = ['Farmer', 'Teacher', 'Trader', 'Nurse', 'Driver', 'Engineer', 'Accountant', 'Tailor']
+SUBJECTS = ['Mathematics', 'English', 'Kiswahili', 'Science', 'Social Studies', 'CRE', 'Art']
+SUPPORT_ROLES = ['Cook', 'Driver', 'Guard', 'Cleaner', 'Bursar', 'Librarian']
+
+
+def _phone(rng):
+    return f"+2547{rng.randrange(10_000_000, 100_000_000)}"
+
+
+def _bulk(model, rows):
+    """Insert a (possibly lazy) iterable of unsaved rows in batches; returns the count."""
+    rows, written = iter(rows), 0
+    while batch := list(islice(rows, BATCH_SIZE)):
+        model.objects.bulk_create(batch)
+        written += len(batch)
+    return written
+
+
+def school_days(days, today=None):
+    """Weekdays in the `days` days up to and including today, oldest first."""
+    today = today or timezone.localdate()
+    start = today - timedelta(days=days - 1)
+    return [start + timedelta(n) for n in range(days) if (start + timedelta(n)).weekday() < 5]
+
+
+def generate_school(name, students, days, rng, password_hash=None):
+    """
+    Write one synthetic school with `students` students and `days` days of
+    attendance history. Returns a dict of row counts per model.
+    """
+    password_hash = password_hash or make_password(DEMO_PASSWORD)
+    with transaction.atomic():
+        school = School.objects.create(name=name, address=f"{rng.randrange(1, 400)} {rng.choice(LAST_NAMES)} Road")
+        prefix = f"s{school.pk}"
+
+        def login(username, role, **fields):
+            return User(username=f"{prefix}-{username}", password=password_hash, role=role, school=school, **fields)
+
+        streams = Stream.objects.bulk_create([Stream(name=stream, school=school) for stream in STREAM_NAMES])
+        teacher_count = max(1, students // STUDENTS_PER_TEACHER)
+        parent_count = max(1, round(students / STUDENTS_PER_PARENT))
+
+        _bulk(User, [login('admin', 'admin')])
+        _bulk(User, (login(f'teacher{n}', 'teacher') for n in range(1, teacher_count + 1)))
+        _bulk(User, (
+            login(f'parent{n}', 'parent', first_name=rng.choice(FIRST_NAMES), phone_number=_phone(rng))
+            for n in range(1, parent_count + 1)
+        ))
+        parent_ids = list(User.objects.filter(school=school, role='parent').values_list('pk', flat=True))
+
+        teacher_names = [(rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)) for _ in range(teacher_count)]
+        _bulk(Teacher, (
+            Teacher(
+                school=school, first_name=first, last_name=last,
+                national_id=str(rng.randrange(10_000_000, 40_000_000)),
+                teacher_id=format_teacher_id(first, last, school.pk, number),
+                subjects=', '.join(rng.sample(SUBJECTS, 2)),
+            )
+            for number, (first, last) in zip(reserve_numbers(school.pk, 'teacher', teacher_count), teacher_names)
+        ))
+        staff_names = [f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}" for _ in SUPPORT_ROLES]
+        _bulk(SupportStaff, (
+            SupportStaff(
+                school=school, name=staff_name, role=role,
+                working_id=format_working_id(staff_name, school.pk, number),
+            )
+            for number, staff_name, role in zip(
+                reserve_numbers(school.pk, 'staff', len(SUPPORT_ROLES)), staff_names, SUPPORT_ROLES
+            )
+        ))
+
+        today, roster = timezone.localdate(), []
+        for number in reserve_numbers(school.pk, 'student', students):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            grade = rng.randrange(len(GRADES))
+            roster.append(Student(
+                school=school, first_name=first, last_name=last,
+                date_of_birth=date(today.year - 6 - grade, 1, 1) + timedelta(days=rng.randrange(365)),
+                gender=rng.choice(('Male', 'Female')),
+                grade=GRADES[grade],
+                stream=rng.choice(streams),
+                registration_number=format_registration_number(first, last, school.pk, number),
+                parent_id=rng.choice(parent_ids),
+            ))
+        _bulk(Student, roster)
+        student_ids = [student.pk for student in roster]
+
+        _bulk(ParentDetails, (
+            ParentDetails(
+                student_id=pk,
+                father_name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                father_phone=_phone(rng), father_occupation=rng.choice(OCCUPATIONS),
+                mother_name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                mother_phone=_phone(rng), mother_occupation=rng.choice(OCCUPATIONS),
+            )
+            for pk in student_ids
+        ))
+
+        # A few habitual absentees make the reminders and charts less uniform.
+        present_rate = {pk: PRESENT_RATE if rng.random() > 0.05 else 0.6 for pk in student_ids}
+        attendance = _bulk(Attendance, (
+            Attendance(student_id=pk, date=day, status='Present' if rng.random() < present_rate[pk] else 'Absent')
+            for day in school_days(days) for pk in student_ids
+        ))
+
+        def paid():
+            roll = rng.random()
+            if roll < 0.6:
+                return TERM_FEE
+            return Decimal(rng.randrange(0, 15)) * 1000 if roll < 0.95 else Decimal(0)
+
+        fees = _bulk(FeeRecord, (
+            FeeRecord(student_id=pk, term=term, amount_due=TERM_FEE, amount_paid=paid())
+            for term in TERMS for pk in student_ids
+        ))
+
+    return {
+        'school': school.pk,
+        'students': len(student_ids),
+        'teachers': teacher_count,
+        'parents': parent_count,
+        'attendance': attendance,
+        'fee_records': fees,
+    }
+
+
+def finish_generation():
+    """Rebuild everything the signals would have kept in step (rollup, ledger, search index)."""
+    rebuild_attendance_summary()
+    rebuild_fee_ledger()
+    with transaction.atomic():
+        rebuild_search_index()
+
+
+def generate_schools(schools, students, days, seed=0, log=None):
+    """Write `schools` synthetic schools and rebuild the derived tables. Returns per-school counts."""
+    rng = random.Random(seed)
+    password_hash = make_password(DEMO_PASSWORD)
+    first = School.objects.count() + 1
+    results = []
+    for n in range(first, first + schools):
+        counts = generate_school(f"Demo School {n}", students, days, rng, password_hash)
+        if log:
+            log(counts)
+        results.append(counts)
+    finish_generation()
+    return results
+
+
+@contextmanager
+def scratch_database(path, keepdb=False, **overrides):
+    """
+    Run the block against a throwaway SQLite file at `path`, created and
+    migrated like a test database (and deleted afterwards unless `keepdb`).
+    Requests made inside use a local-memory cache and skip the metrics
+    middleware, so they touch neither the shared file cache nor /metrics.
+    `overrides` are passed on to override_settings.
+    """
+    if replica_configured():
+        raise ImproperlyConfigured("Unset ANALYTICS_DB; a scratch run must not read the real replica.")
+    overrides.setdefault('CACHES', {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    overrides.setdefault('MIDDLEWARE', [
+        m for m in settings.MIDDLEWARE if m != 'theschool.metrics_utils.RequestMetricsMiddleware'
+    ])
+
+    connection.settings_dict['TEST']['NAME'] = str(path)
+    setup_test_environment(debug=False)
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False, keepdb=keepdb)
+    try:
+        with override_settings(**overrides):
+            yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+        teardown_test_environment()
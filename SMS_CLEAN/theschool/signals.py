@@ -0,0 +1,312 @@
+# theschool/signals.py
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .attendance_utils import apply_attendance_delta, move_student_attendance
+from .cache_utils import bump_school_version
+from .fee_utils import apply_fee_delta, move_student_fees
+from .models import (
+    Attendance, AttendanceDailySummary, FeeRecord, GuardianDetails, ParentDetails, School, Stream,
+    Student, SupportStaff, Teacher, User,
+)
+from .image_utils import normalize_photo, schedule_thumbnails
+from .media_utils import PHOTO_FIELDS, add_reference, release_reference
+from .search_utils import index_objects, remove_from_index
+
+# Students whose whole history is being removed in one go; their Attendance
+# rows are cascade-deleted individually and must not be subtracted twice.
+# Each id maps to the atomic block of its delete, so an entry left behind by
+# a delete that raised is ignored once that block has been exited.
+_deleting = threading.local()
+
+
+def _students_being_deleted():
+    if not hasattr(_deleting, 'students'):
+        _deleting.students = {}
+    return _deleting.students
+
+
+def _being_deleted(student_id):
+    block = _students_being_deleted().get(student_id)
+    if block is None:
+        return False
+    if block in transaction.get_connection().atomic_blocks:
+        return True
+    _students_being_deleted().pop(student_id, None)
+    return False
+
+
+def _student_key(student_id):
+    return Student.objects.values_list('school_id', 'stream_id').get(pk=student_id)
+
+
+# ----------------------------
+# Attendance rollup
+# ----------------------------
+
+@receiver(pre_save, sender=Attendance)
+def remember_previous_attendance(sender, instance, raw=False, **kwargs):
+    instance._previous = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    instance._previous = (
+        Attendance.objects.filter(pk=instance.pk).values_list('student_id', 'date', 'status').first()
+    )
+
+
+@receiver(post_save, sender=Attendance)
+def update_summary_on_attendance_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous', None)
+    if previous:
+        student_id, day, status = previous
+        school_id, stream_id = _student_key(student_id)
+        apply_attendance_delta(school_id, stream_id, day, -int(status == 'Present'), -1)
+        bump_school_version(school_id)
+
+    school_id, stream_id = _student_key(instance.student_id)
+    apply_attendance_delta(school_id, stream_id, instance.date, int(instance.status == 'Present'), 1)
+    bump_school_version(school_id)
+
+
+@receiver(post_delete, sender=Attendance)
+def update_summary_on_attendance_delete(sender, instance, **kwargs):
+    if _being_deleted(instance.student_id):
+        return
+    key = Student.objects.filter(pk=instance.student_id).values_list('school_id', 'stream_id').first()
+    if key:
+        apply_attendance_delta(*key, instance.date, -int(instance.status == 'Present'), -1)
+        bump_school_version(key[0])
+
+
+@receiver(pre_save, sender=Student)
+def move_rollups_on_student_move(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    old_key = Student.objects.filter(pk=instance.pk).values_list('school_id', 'stream_id').first()
+    new_key = (instance.school_id, instance.stream_id)
+    if old_key and tuple(old_key) != new_key:
+        move_student_attendance(instance.pk, old_key, new_key)
+        if old_key[0] != instance.school_id:
+            # A transfer also carries the student's fees to the new school's term totals.
+            move_student_fees(instance.pk, old_key[0], instance.school_id)
+
+
+@receiver(pre_delete, sender=Student)
+def remove_student_from_summary(sender, instance, **kwargs):
+    move_student_attendance(instance.pk, (instance.school_id, instance.stream_id), None)
+    # The collector runs the whole delete inside one atomic block.
+    blocks = transaction.get_connection().atomic_blocks
+    if blocks:
+        _students_being_deleted()[instance.pk] = blocks[-1]
+
+
+@receiver(post_delete, sender=Student)
+def forget_deleted_student(sender, instance, **kwargs):
+    _students_being_deleted().pop(instance.pk, None)
+
+
+@receiver(pre_delete, sender=Stream)
+def remember_stream_summary(sender, instance, **kwargs):
+    instance._summary_rows = list(
+        AttendanceDailySummary.objects.filter(stream=instance).values_list('date', 'present', 'total')
+    )
+
+
+@receiver(post_delete, sender=Stream)
+def fold_stream_into_school_summary(sender, instance, **kwargs):
+    # Students in a deleted stream fall back to stream=NULL, so their counts do
+    # too. Deferred to commit so deleting a whole school never re-creates rows.
+    rows = getattr(instance, '_summary_rows', [])
+    if not rows:
+        return
+
+    def fold():
+        if not School.objects.filter(pk=instance.school_id).exists():
+            return
+        with transaction.atomic():
+            for day, present, total in rows:
+                apply_attendance_delta(instance.school_id, None, day, present, total)
+
+    transaction.on_commit(fold)
+
+
+# ----------------------------
+# Fee ledger
+# ----------------------------
+
+def _school_of(student_id):
+    return Student.objects.filter(pk=student_id).values_list('school_id', flat=True).first()
+
+
+def _amounts(instance):
+    # Views pass the raw POST strings; coerce them the way the DB column will.
+    return (
+        FeeRecord._meta.get_field('amount_due').to_python(instance.amount_due),
+        FeeRecord._meta.get_field('amount_paid').to_python(instance.amount_paid),
+    )
+
+
+@receiver(pre_save, sender=FeeRecord)
+def remember_previous_fee(sender, instance, raw=False, **kwargs):
+    instance._previous = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    instance._previous = (
+        FeeRecord.objects.filter(pk=instance.pk)
+        .values_list('student_id', 'term', 'amount_due', 'amount_paid')
+        .first()
+    )
+
+
+@receiver(post_save, sender=FeeRecord)
+def update_ledger_on_fee_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous', None)
+    if previous:
+        student_id, term, due, paid = previous
+        school_id = _school_of(student_id)
+        apply_fee_delta(student_id, school_id, term, -due, -paid)
+        bump_school_version(school_id)
+
+    school_id = _school_of(instance.student_id)
+    due, paid = _amounts(instance)
+    apply_fee_delta(instance.student_id, school_id, instance.term, due, paid)
+    bump_school_version(school_id)
+
+
+@receiver(post_delete, sender=FeeRecord)
+def update_ledger_on_fee_delete(sender, instance, **kwargs):
+    school_id = _school_of(instance.student_id)
+    if school_id is not None:
+        due, paid = _amounts(instance)
+        apply_fee_delta(instance.student_id, school_id, instance.term, -due, -paid)
+        bump_school_version(school_id)
+
+
+# ----------------------------
+# School cache version
+# ----------------------------
+
+@receiver(pre_save, sender=Student)
+@receiver(pre_save, sender=Teacher)
+@receiver(pre_save, sender=SupportStaff)
+@receiver(pre_save, sender=Stream)
+def remember_previous_school(sender, instance, raw=False, **kwargs):
+    instance._previous_school_id = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    instance._previous_school_id = (
+        sender.objects.filter(pk=instance.pk).values_list('school_id', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+@receiver(post_save, sender=Teacher)
+@receiver(post_delete, sender=Teacher)
+@receiver(post_save, sender=SupportStaff)
+@receiver(post_delete, sender=SupportStaff)
+@receiver(post_save, sender=Stream)
+@receiver(post_delete, sender=Stream)
+def bump_version_on_roster_change(sender, instance, **kwargs):
+    # Attendance and fee changes bump in their rollup/ledger handlers above,
+    # which already know the school.
+    bump_school_version(instance.school_id)
+    # A move to another school also changes the old school's roster.
+    previous = getattr(instance, '_previous_school_id', None)
+    if previous is not None and previous != instance.school_id:
+        bump_school_version(previous)
+
+
+# ----------------------------
+# Search index
+# ----------------------------
+
+SEARCH_KINDS = {Student: 'student', Teacher: 'teacher', SupportStaff: 'staff'}
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_save, sender=Teacher)
+@receiver(post_save, sender=SupportStaff)
+def index_person(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_objects(SEARCH_KINDS[sender], [instance.pk])
+
+
+@receiver(post_delete, sender=Student)
+@receiver(post_delete, sender=Teacher)
+@receiver(post_delete, sender=SupportStaff)
+def unindex_person(sender, instance, **kwargs):
+    remove_from_index(SEARCH_KINDS[sender], [instance.pk])
+
+
+@receiver(post_save, sender=ParentDetails)
+@receiver(post_delete, sender=ParentDetails)
+@receiver(post_save, sender=GuardianDetails)
+@receiver(post_delete, sender=GuardianDetails)
+def reindex_student_contacts(sender, instance, raw=False, **kwargs):
+    # Parent and guardian names/phones are part of the student's document.
+    if raw or _being_deleted(instance.student_id):
+        return
+    index_objects('student', [instance.student_id])
+
+
+@receiver(post_save, sender=User)
+def reindex_parent_children(sender, instance, raw=False, **kwargs):
+    # A parent account's name and phone are searchable on each of their children.
+    if raw or instance.role != 'parent':
+        return
+    index_objects('student', Student.objects.filter(parent=instance).values_list('pk', flat=True))
+
+
+# ----------------------------
+# Photos
+# ----------------------------
+
+@receiver(pre_save, sender=Student)
+@receiver(pre_save, sender=Teacher)
+@receiver(pre_save, sender=SupportStaff)
+def normalize_uploaded_photo(sender, instance, raw=False, **kwargs):
+    field = PHOTO_FIELDS[sender]
+    photo = getattr(instance, field)
+    instance._new_photo = not raw and bool(photo) and not photo._committed
+    instance._previous_photo = None
+    if raw:
+        return
+    # A committed, non-empty photo is the one loaded from the row; only an
+    # upload or a cleared field can change which file the row points at.
+    if not instance._state.adding and (instance._new_photo or not photo):
+        instance._previous_photo = (
+            sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+        )
+    if instance._new_photo:
+        normalize_photo(photo)
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_save, sender=Teacher)
+@receiver(post_save, sender=SupportStaff)
+def track_saved_photo(sender, instance, raw=False, **kwargs):
+    if not getattr(instance, '_new_photo', False) and not getattr(instance, '_previous_photo', None):
+        return
+    name = getattr(instance, PHOTO_FIELDS[sender]).name or ''
+    previous = instance._previous_photo or ''
+    if name == previous:
+        return
+    if instance._new_photo:
+        add_reference(name)
+        schedule_thumbnails(name)
+    release_reference(previous)
+
+
+@receiver(post_delete, sender=Student)
+@receiver(post_delete, sender=Teacher)
+@receiver(post_delete, sender=SupportStaff)
+def release_deleted_photo(sender, instance, **kwargs):
+    release_reference(getattr(instance, PHOTO_FIELDS[sender]).name)
@@ -0,0 +1,70 @@
+# theschool/sms_backends.py
+"""
+SMS delivery backends used by the outbox worker. Pick one with
+settings.SMS_BACKEND (a dotted path); a real gateway (Twilio, Africa's
+Talking, ...) subclasses BaseSMSBackend and implements send() or, when the
+gateway accepts batches, send_messages().
+"""
+import sys
+import threading
+
+from django.conf import settings
+
+
+class SMSDeliveryError(Exception):
+    """Raised by a backend when a message could not be handed to the gateway."""
+
+
+class BaseSMSBackend:
+    def send(self, message):
+        """Deliver one OutboundMessage or raise SMSDeliveryError."""
+        raise NotImplementedError
+
+    def send_messages(self, messages):
+        """
+        Deliver a batch. Returns one entry per message, in order: None when
+        it was accepted, otherwise the error text.
+        """
+        results = []
+        for message in messages:
+            try:
+                self.send(message)
+                results.append(None)
+            except Exception as exc:
+                results.append(str(exc) or exc.__class__.__name__)
+        return results
+
+
+class ConsoleSMSBackend(BaseSMSBackend):
+    """Writes messages to stdout; the default while no gateway is configured."""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+
+    def send(self, message):
+        with self._lock:
+            self.stream.write(f"Sending SMS to {message.phone_number}: {message.body}\n")
+            self.stream.flush()
+
+
+class FileSMSBackend(BaseSMSBackend):
+    """Appends messages to settings.SMS_FILE_PATH, one per line."""
+
+    def __init__(self, path=None):
+        self.path = path or getattr(settings, 'SMS_FILE_PATH', settings.BASE_DIR / 'sms_outbox.log')
+
+    def send_messages(self, messages):
+        with open(self.path, 'a', encoding='utf-8') as handle:
+            for message in messages:
+                body = message.body.replace('\n', ' ')
+                handle.write(f"{message.pk}\t{message.phone_number}\t{body}\n")
+        return [None] * len(messages)
+
+
+class LocMemSMSBackend(BaseSMSBackend):
+    """Keeps sent messages in LocMemSMSBackend.outbox; for tests."""
+    outbox = []
+
+    def send(self, message):
+        LocMemSMSBackend.outbox.append((message.phone_number, message.body))
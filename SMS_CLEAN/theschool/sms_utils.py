@@ -0,0 +1,152 @@
+# theschool/sms_utils.py
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import OutboundMessage
+
+BATCH_SIZE = getattr(settings, 'SMS_BATCH_SIZE', 100)
+MAX_ATTEMPTS = getattr(settings, 'SMS_MAX_ATTEMPTS', 5)
+RETRY_BASE_SECONDS = getattr(settings, 'SMS_RETRY_BASE_SECONDS', 30)
+RETRY_MAX_SECONDS = getattr(settings, 'SMS_RETRY_MAX_SECONDS', 3600)
+# A claim older than this belongs to a worker that died mid-batch.
+CLAIM_TIMEOUT = timedelta(seconds=getattr(settings, 'SMS_CLAIM_TIMEOUT_SECONDS', 300))
+
+
+def queue_sms(phone_number, message, school=None):
+    """Put one SMS in the outbox. This is all the request path does; the worker sends it."""
+    return OutboundMessage.objects.create(
+        school_id=getattr(school, 'pk', school),
+        phone_number=phone_number,
+        body=message,
+    )
+
+
+def get_backend():
+    path = getattr(settings, 'SMS_BACKEND', 'theschool.sms_backends.ConsoleSMSBackend')
+    return import_string(path)()
+
+
+def retry_delay(attempts):
+    """Exponential backoff after the given number of failed attempts."""
+    return timedelta(seconds=min(RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0), RETRY_MAX_SECONDS))
+
+
+def release_stale_claims(now=None):
+    """
+    Hand messages claimed by a crashed worker back to the queue. The claim
+    already counted as an attempt, so a message that keeps crashing its
+    worker is marked failed once it reaches MAX_ATTEMPTS.
+    """
+    now = now or timezone.now()
+    stale = OutboundMessage.objects.filter(status=OutboundMessage.SENDING, claimed_at__lt=now - CLAIM_TIMEOUT)
+    failed = stale.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status=OutboundMessage.FAILED, claimed_by='', claimed_at=None,
+        last_error="The worker stopped while sending this message.",
+    )
+    return failed + stale.update(status=OutboundMessage.PENDING, claimed_by='', claimed_at=None)
+
+
+def claim_batch(size=BATCH_SIZE, now=None):
+    """
+    Atomically mark up to `size` due messages as sending and return
+    (claim token, messages). The claim is one UPDATE, so two workers never
+    pick the same row; writes of the outcome filter on the token, so a
+    worker whose claim went stale cannot overwrite the next one's.
+    """
+    now = now or timezone.now()
+    token = uuid.uuid4().hex
+    due = (
+        OutboundMessage.objects.filter(status=OutboundMessage.PENDING, next_attempt_at__lte=now)
+        .order_by('next_attempt_at')
+        .values('pk')[:size]
+    )
+    claimed = OutboundMessage.objects.filter(pk__in=due, status=OutboundMessage.PENDING).update(
+        status=OutboundMessage.SENDING,
+        claimed_by=token,
+        claimed_at=now,
+        attempts=F('attempts') + 1,
+    )
+    if not claimed:
+        return token, []
+    return token, list(OutboundMessage.objects.filter(claimed_by=token).order_by('next_attempt_at', 'pk'))
+
+
+def deliver_batch(backend=None, size=BATCH_SIZE):
+    """
+    Claim one batch, send it through the backend and record the outcome.
+    Failures go back to the queue with exponential backoff until MAX_ATTEMPTS,
+    then stay failed. Messages whose claim was released as stale meanwhile
+    are left to whoever holds them now. Returns {'claimed', 'sent',
+    'retried', 'failed'}.
+    """
+    backend = backend or get_backend()
+    token, messages = claim_batch(size)
+    counts = {'claimed': len(messages), 'sent': 0, 'retried': 0, 'failed': 0}
+    if not messages:
+        return counts
+
+    try:
+        results = list(backend.send_messages(messages))
+    except Exception as exc:
+        results = [str(exc) or exc.__class__.__name__] * len(messages)
+
+    now = timezone.now()
+    ours = OutboundMessage.objects.filter(claimed_by=token)
+    sent = [message.pk for message, error in zip(messages, results) if error is None]
+    counts['sent'] = ours.filter(pk__in=sent).update(
+        status=OutboundMessage.SENT, sent_at=now, claimed_by='', last_error=''
+    )
+
+    # One UPDATE per outcome: (attempts made, error) -> message ids.
+    outcomes = defaultdict(list)
+    for message, error in zip(messages, results):
+        if error is not None:
+            outcomes[(min(message.attempts, MAX_ATTEMPTS), error)].append(message.pk)
+    for (attempts, error), pks in outcomes.items():
+        if attempts >= MAX_ATTEMPTS:
+            fields = {'status': OutboundMessage.FAILED}
+        else:
+            fields = {'status': OutboundMessage.PENDING, 'next_attempt_at': now + retry_delay(attempts)}
+        updated = ours.filter(pk__in=pks).update(last_error=error, claimed_by='', **fields)
+        counts['failed' if attempts >= MAX_ATTEMPTS else 'retried'] += updated
+    return counts
+
+
+def outbox_stats(now=None):
+    """
+    Queue depth and throughput: messages per status (except the ever-growing
+    sent history), the age of the oldest due message and sends in the last
+    minute and hour.
+    """
+    now = now or timezone.now()
+    depth = dict(
+        OutboundMessage.objects.filter(
+            status__in=[OutboundMessage.PENDING, OutboundMessage.SENDING, OutboundMessage.FAILED]
+        )
+        .order_by()
+        .values_list('status')
+        .annotate(n=Count('pk'))
+    )
+    oldest = OutboundMessage.objects.filter(
+        status=OutboundMessage.PENDING, next_attempt_at__lte=now
+    ).aggregate(oldest=Min('next_attempt_at'))['oldest']
+    recent = OutboundMessage.objects.filter(
+        status=OutboundMessage.SENT, sent_at__gte=now - timedelta(hours=1)
+    ).aggregate(
+        last_hour=Count('pk'),
+        last_minute=Count('pk', filter=Q(sent_at__gte=now - timedelta(minutes=1))),
+    )
+    return {
+        'pending': depth.get(OutboundMessage.PENDING, 0),
+        'sending': depth.get(OutboundMessage.SENDING, 0),
+        'failed': depth.get(OutboundMessage.FAILED, 0),
+        'oldest_due_seconds': round((now - oldest).total_seconds(), 1) if oldest else 0,
+        'sent_last_minute': recent['last_minute'],
+        'sent_last_hour': recent['last_hour'],
+    }
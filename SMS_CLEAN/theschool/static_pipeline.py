@@ -0,0 +1,182 @@
+# theschool/static_pipeline.py
+"""
+Production build of the static files, run by `collectstatic` when
+STATIC_PIPELINE is on:
+
+  * every stylesheet is minified;
+  * each group of stylesheets a page lists in {% css_bundle %} is joined
+    into one file under bundles/, so the page makes one CSS request;
+  * everything gets a content-hashed name (ManifestStaticFilesStorage);
+  * text files get .gz (and .br, when the brotli package is installed)
+    sidecars next to them.
+
+`serve_static` serves that build with far-future cache headers for the
+hashed names, picking a precompressed sidecar from Accept-Encoding. A
+front-end server can serve STATIC_ROOT directly instead (nginx:
+gzip_static / brotli_static).
+"""
+import gzip
+import mimetypes
+import posixpath
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:  # optional: gzip sidecars only
+    brotli = None
+
+COMPRESSIBLE = ('.css', '.js', '.svg', '.txt', '.html', '.json', '.map')
+MIN_COMPRESS_SIZE = 256
+HASHED_MAX_AGE = 365 * 24 * 60 * 60
+UNHASHED_MAX_AGE = 60 * 60
+
+_BUNDLE_TAG = re.compile(r"{%\s*css_bundle\s+((?:['\"][^'\"]+['\"]\s*)+)%}")
+_QUOTED = re.compile(r"['\"]([^'\"]+)['\"]")
+# ManifestStaticFilesStorage inserts the first 12 hex digits of the MD5: sidebar.3f2a9c01b7de.css
+_HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+
+
+def _minify_code(code):
+    code = re.sub(r'\s+', ' ', code)
+    code = re.sub(r'\s*([{};,>~])\s*', r'\1', code)
+    # Keep the space in selectors like "a :hover" but not around declarations.
+    code = re.sub(r'\s*:\s*(?=[^{}]*[;}])', ':', code)
+    return code.replace(';}', '}')
+
+
+def minify_css(text):
+    """Drop comments and redundant whitespace. Quoted strings are left untouched."""
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.S)
+    parts = re.split(r'("(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\')', text)
+    return ''.join(
+        part if index % 2 else _minify_code(part) for index, part in enumerate(parts)
+    ).strip()
+
+
+def bundle_name(paths):
+    """bundles/<stem>-<stem>....css for an ordered group of stylesheets."""
+    stems = [posixpath.splitext(posixpath.basename(path))[0] for path in paths]
+    return posixpath.join('bundles', '-'.join(stems) + '.css')
+
+
+def _template_dirs():
+    dirs = [Path(d) for engine in settings.TEMPLATES for d in engine.get('DIRS', [])]
+    from django.apps import apps
+
+    dirs += [Path(app.path) / 'templates' for app in apps.get_app_configs()]
+    return [d for d in dirs if d.is_dir()]
+
+
+def discover_bundles():
+    """{bundle name: [stylesheet paths]} for every multi-file {% css_bundle %} in the project's templates."""
+    bundles = {}
+    for directory in _template_dirs():
+        for template in directory.rglob('*.html'):
+            for match in _BUNDLE_TAG.finditer(template.read_text(encoding='utf-8')):
+                paths = _QUOTED.findall(match.group(1))
+                if len(paths) > 1:
+                    bundles[bundle_name(paths)] = paths
+    return bundles
+
+
+def _compress(data):
+    sidecars = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        sidecars['.br'] = brotli.compress(data, quality=11)
+    return sidecars
+
+
+class PipelineStaticStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage that minifies and bundles CSS first and precompresses afterwards."""
+
+    def _replace(self, name, data):
+        if self.exists(name):
+            self.delete(name)
+        self._save(name, ContentFile(data))
+
+    def _read(self, name):
+        with self.open(name) as handle:
+            return handle.read().decode('utf-8')
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            yield from super().post_process(paths, dry_run, **options)
+            return
+
+        # Hashing reads each file from the storage in `paths`; point the
+        # stylesheets at the minified copies collected here.
+        for name in [name for name in paths if name.endswith('.css')]:
+            self._replace(name, minify_css(self._read(name)).encode('utf-8'))
+            paths[name] = (self, name)
+
+        for name, members in discover_bundles().items():
+            missing = [path for path in members if path not in paths]
+            if missing:
+                yield name, None, ValueError(f"Bundle {name} lists unknown files: {', '.join(missing)}")
+                continue
+            self._replace(name, '\n'.join(self._read(path) for path in members).encode('utf-8'))
+            paths[name] = (self, name)
+
+        yield from super().post_process(paths, dry_run, **options)
+
+        for name in set(paths) | set(self.hashed_files.values()):
+            if not name.endswith(COMPRESSIBLE) or not self.exists(name):
+                continue
+            with self.open(name) as handle:
+                data = handle.read()
+            if len(data) < MIN_COMPRESS_SIZE:
+                continue
+            for suffix, compressed in _compress(data).items():
+                if len(compressed) < len(data):
+                    self._replace(name + suffix, compressed)
+
+
+def _accepted_encodings(request):
+    accepted = request.headers.get('Accept-Encoding', '')
+    tokens = {part.split(';')[0].strip().lower() for part in accepted.split(',')}
+    return [(token, suffix) for token, suffix in (('br', '.br'), ('gzip', '.gz')) if token in tokens]
+
+
+def serve_static(request, path):
+    """
+    Serve a file from STATIC_ROOT. Content-hashed names never change, so they
+    are cached for a year and marked immutable; the browser does not ask
+    again on later page loads. A .br or .gz sidecar is sent when the client
+    accepts it.
+    """
+    fullpath = Path(safe_join(settings.STATIC_ROOT, path))
+    if not fullpath.is_file() or fullpath.suffix in ('.gz', '.br'):
+        raise Http404("File not found")
+
+    stat = fullpath.stat()
+    if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime):
+        return HttpResponseNotModified()
+
+    content_type = mimetypes.guess_type(fullpath.name)[0] or 'application/octet-stream'
+    encoding = None
+    for token, suffix in _accepted_encodings(request):
+        sidecar = fullpath.with_name(fullpath.name + suffix)
+        if sidecar.is_file():
+            fullpath, encoding = sidecar, token
+            break
+
+    response = FileResponse(fullpath.open('rb'), content_type=content_type, filename=posixpath.basename(path))
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    if encoding:
+        response['Content-Encoding'] = encoding
+    if path.endswith(COMPRESSIBLE):
+        response['Vary'] = 'Accept-Encoding'
+    if _HASHED_NAME.search(path):
+        response['Cache-Control'] = f'public, max-age={HASHED_MAX_AGE}, immutable'
+    else:
+        response['Cache-Control'] = f'public, max-age={UNHASHED_MAX_AGE}'
+    return response
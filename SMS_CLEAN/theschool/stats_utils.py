@@ -1,48 +1,222 @@
 # theschool/stats_utils.py
-from datetime import date, timedelta
+from datetime import timedelta
+
+from django.db.models import Count, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .cache_utils import cached_for_school
+
+DAY_KEYS = ["mon", "tue", "wed", "thu", "fri"]
+# Writes retire the snapshot by bumping the school's cache version; the TTL
+# only bounds staleness from writes that bypass the ORM hooks (raw SQL).
+SNAPSHOT_TTL = 300
+
 
 def _week_dates(reference=None):
     """Return Monday..Friday dates for week containing reference (or today)."""
     if reference is None:
-        reference = date.today()
+        reference = timezone.localdate()
     monday = reference - timedelta(days=reference.weekday())  # Monday
     return [monday + timedelta(days=i) for i in range(5)]
 
-def weekly_attendance_for_school(school):
+
+def _count_subquery(model, school_field="school", **filters):
+    """COUNT(*) of `model` rows for the outer school, usable inside annotate()."""
+    qs = (
+        model.objects.filter(**{school_field: OuterRef("pk")}, **filters)
+        .order_by()
+        .values(school_field)
+        .annotate(n=Count("pk"))
+        .values("n")
+    )
+    return Coalesce(Subquery(qs), 0)
+
+
+def _sum_subquery(model, field, school_field="school", **filters):
+    """SUM(field) of `model` rows for the outer school, usable inside annotate()."""
+    qs = (
+        model.objects.filter(**{school_field: OuterRef("pk")}, **filters)
+        .order_by()
+        .values(school_field)
+        .annotate(total=Sum(field))
+        .values("total")
+    )
+    return Coalesce(Subquery(qs), 0, output_field=model._meta.get_field(field))
+
+
+def weekly_attendance_for_school(school, reference=None):
     """
-    Attempts to compute attendance % for Mon..Fri and weekly average.
-    This expects you to have an Attendance model with:
-      - date (date)
-      - present (bool)
-      - student (FK) or school (FK)
-    If no compatible model exists, returns zeros.
+    Attendance % for Mon..Fri of the current week plus the weekly average.
+    Reads the AttendanceDailySummary rollup, so the cost is a handful of
+    (school, date) rows no matter how many students or how much history.
     """
-    try:
-        # Import late to avoid circular imports
-        from .models import Attendance  # adapt name if different
-    except Exception:
-        # Attendance model not found — return zeros
-        return {"mon": 0, "tue": 0, "wed": 0, "thu": 0, "fri": 0, "weekly_attendance_avg": 0}
+    from .models import AttendanceDailySummary
+
+    dates = _week_dates(reference)
+    aggregates = {}
+    for key, day in zip(DAY_KEYS, dates):
+        aggregates[f"{key}_total"] = Sum("total", filter=Q(date=day), default=0)
+        aggregates[f"{key}_present"] = Sum("present", filter=Q(date=day), default=0)
+
+    row = AttendanceDailySummary.objects.filter(
+        school=school, date__range=(dates[0], dates[-1])
+    ).aggregate(**aggregates)
 
-    dates = _week_dates()
-    day_keys = ["mon", "tue", "wed", "thu", "fri"]
     results = {}
     percents = []
-    for key, day in zip(day_keys, dates):
-        # try multiple possible filters: if Attendance has school FK or student FK
-        qs = Attendance.objects.filter(date=day)
-        if hasattr(Attendance, "school_id"):
-            qs = qs.filter(school=school)
-        elif hasattr(Attendance, "student_id"):
-            # try students belonging to school
-            qs = qs.filter(student__school=school)
-        total = qs.count()
-        if total == 0:
-            pct = 0
-        else:
-            present = qs.filter(present=True).count()
-            pct = (present / total) * 100.0
+    for key in DAY_KEYS:
+        total = row[f"{key}_total"]
+        pct = (row[f"{key}_present"] / total) * 100.0 if total else 0
         results[key] = round(pct, 1)
         percents.append(pct)
     results["weekly_attendance_avg"] = round(sum(percents) / len(percents), 1) if percents else 0
     return results
+
+
+def school_dashboard_stats(school, reference=None):
+    """
+    Headline numbers for the school admin dashboard.
+
+    Runs a fixed number of queries regardless of school size: one for the
+    staff/stream counts, one for the student/gender counts and one for the
+    week's attendance. Returns the context keys `admin_dashboard.html` reads.
+    """
+    from .models import School, Student, SupportStaff, Stream, Teacher
+
+    empty = {
+        "total_students": 0,
+        "total_teachers": 0,
+        "total_staff": 0,
+        "total_streams": 0,
+        "boys_count": 0,
+        "girls_count": 0,
+        "weekly_attendance_avg": 0,
+        **{f"{key}_attendance": 0 for key in DAY_KEYS},
+    }
+    if school is None:
+        return empty
+
+    counts = (
+        School.objects.filter(pk=school.pk)
+        .annotate(
+            total_teachers=_count_subquery(Teacher),
+            total_staff=_count_subquery(SupportStaff),
+            total_streams=_count_subquery(Stream),
+        )
+        .values("total_teachers", "total_staff", "total_streams")
+        .first()
+    ) or {}
+
+    students = Student.objects.filter(school=school).aggregate(
+        total_students=Count("pk"),
+        boys_count=Count("pk", filter=Q(gender="Male")),
+        girls_count=Count("pk", filter=Q(gender="Female")),
+    )
+
+    attendance = weekly_attendance_for_school(school, reference)
+
+    stats = dict(empty)
+    stats.update(counts)
+    stats.update(students)
+    stats["weekly_attendance_avg"] = attendance["weekly_attendance_avg"]
+    for key in DAY_KEYS:
+        stats[f"{key}_attendance"] = attendance[key]
+    return stats
+
+
+def _percent(part, whole):
+    return round(float(part) * 100 / float(whole), 2) if whole else 0
+
+
+def school_fee_compliance(school):
+    """Percentage of billed fees collected across all terms, read from the fee ledger."""
+    from .models import SchoolFeeTotal
+
+    fees = SchoolFeeTotal.objects.filter(school=school).aggregate(
+        paid=Sum("total_paid", default=0), due=Sum("total_due", default=0)
+    )
+    return _percent(fees["paid"], fees["due"])
+
+
+def school_stats_snapshot(school):
+    """
+    school_dashboard_stats() plus fee_compliance for `school`, cached under
+    the school's cache version so a write to its students, staff, streams,
+    attendance or fees is visible on the next read.
+    """
+    if school is None:
+        return {**school_dashboard_stats(None), "fee_compliance": 0}
+
+    def compute():
+        stats = school_dashboard_stats(school)
+        stats["fee_compliance"] = school_fee_compliance(school)
+        return stats
+
+    # The date is part of the name so the week's attendance rolls over at midnight.
+    return cached_for_school(school.pk, f"stats:{timezone.localdate().isoformat()}", compute, SNAPSHOT_TTL)
+
+
+# panel -> {JSON key: school_stats_snapshot() key} for the dashboard's JSON endpoints.
+DASHBOARD_PANELS = {
+    "counts": {
+        "students": "total_students",
+        "teachers": "total_teachers",
+        "staff": "total_staff",
+        "streams": "total_streams",
+        "weekly_attendance_avg": "weekly_attendance_avg",
+    },
+    "attendance": {key: f"{key}_attendance" for key in DAY_KEYS},
+    "gender": {"boys": "boys_count", "girls": "girls_count"},
+    "fees": {"fee_compliance": "fee_compliance"},
+}
+
+
+def dashboard_panel(school, panel):
+    """One DASHBOARD_PANELS entry filled from the school's cached stats snapshot."""
+    stats = school_stats_snapshot(school)
+    return {key: stats[source] for key, source in DASHBOARD_PANELS[panel].items()}
+
+
+def platform_totals():
+    """Platform-wide headline numbers for the platform dashboard (fixed query count)."""
+    from .models import School, SchoolFeeTotal, Student, User
+
+    fees = SchoolFeeTotal.objects.aggregate(paid=Sum("total_paid", default=0), due=Sum("total_due", default=0))
+    return {
+        "total_schools": School.objects.count(),
+        "total_students": Student.objects.count(),
+        "total_teachers": User.objects.filter(role="teacher").count(),
+        "fee_compliance": _percent(fees["paid"], fees["due"]),
+    }
+
+
+def annotate_school_kpis(schools, reference=None):
+    """
+    Add per-school KPI columns to a School queryset as correlated subqueries,
+    so a page of schools is a single query however many schools there are:
+    admin_username, student_count, teacher_count, fee_paid, fee_due and
+    7-day attendance present/total (read from the attendance rollup).
+    """
+    from .models import AttendanceDailySummary, SchoolFeeTotal, Student, Teacher, User
+
+    today = reference or timezone.localdate()
+    week = {"date__range": (today - timedelta(days=6), today)}
+    admins = User.objects.filter(school=OuterRef("pk"), role="admin").order_by("pk").values("username")[:1]
+    return schools.annotate(
+        admin_username=Subquery(admins),
+        student_count=_count_subquery(Student),
+        teacher_count=_count_subquery(Teacher),
+        fee_paid=_sum_subquery(SchoolFeeTotal, "total_paid"),
+        fee_due=_sum_subquery(SchoolFeeTotal, "total_due"),
+        week_present=_sum_subquery(AttendanceDailySummary, "present", **week),
+        week_total=_sum_subquery(AttendanceDailySummary, "total", **week),
+    )
+
+
+def school_kpi_rows(schools):
+    """Finish the KPI columns on annotated schools: fee compliance and attendance %."""
+    for school in schools:
+        school.fee_compliance = _percent(school.fee_paid, school.fee_due)
+        school.week_attendance = _percent(school.week_present, school.week_total)
+    return schools
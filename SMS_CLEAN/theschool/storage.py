@@ -0,0 +1,55 @@
+# theschool/storage.py
+import hashlib
+import posixpath
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+CHUNK_SIZE = 64 * 1024
+
+
+def content_hash(content):
+    """SHA-256 hex digest of a File, read in chunks; the file is rewound afterwards."""
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks(CHUNK_SIZE):
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores each file as photos/<first two hex digits>/<sha256><ext>, whatever
+    name it was uploaded under. Uploading the same bytes twice returns the
+    existing name instead of writing a second copy, and a name always refers
+    to the same content, so its URL can be cached forever.
+
+    Files are shared between rows; theschool.media_utils counts references
+    and removes a file once nothing points at it.
+    """
+    directory = 'photos'
+
+    def hashed_name(self, name, content):
+        digest = content_hash(content)
+        extension = posixpath.splitext(name)[1].lower()
+        return posixpath.join(self.directory, digest[:2], digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        target = self.hashed_name(name, content)
+        if self.exists(target):
+            return target
+        return super().save(target, content, max_length=max_length)
+
+
+photo_storage = ContentAddressedStorage()
+
+
+def get_photo_storage():
+    """Callable for ImageField(storage=...) so migrations don't serialise the instance."""
+    return photo_storage
@@ -1,25 +1,106 @@
 from django import template
+from django.conf import settings
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+from django.db.models import Count, QuerySet
 
 register = template.Library()
 
+# ----------------------------
+# Request-scoped count loader
+# ----------------------------
+
+class CountLoader:
+    """
+    Per-request memo of per-school row counts. The first lookup for a model
+    fetches counts for every school already rendered on the page in one
+    grouped query, so a tag inside {% for school in schools %} stays O(1).
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.total_schools = None
+
+    def count(self, model, school_id, context):
+        known = self.counts.setdefault(model, {})
+        if school_id not in known:
+            wanted = (_school_ids_in(context) | {school_id}) - known.keys()
+            known.update(dict.fromkeys(wanted, 0))
+            known.update(
+                model.objects.filter(school_id__in=wanted)
+                .order_by()
+                .values('school_id')
+                .annotate(n=Count('pk'))
+                .values_list('school_id', 'n')
+            )
+        return known[school_id]
+
+
+def _school_ids_in(context):
+    """Ids of School objects the template already holds, without running queries."""
+    from theschool.models import School
+
+    ids = set()
+    for value in context.flatten().values():
+        if isinstance(value, School):
+            ids.add(value.pk)
+            continue
+        if isinstance(value, QuerySet):
+            if value.model is not School or value._result_cache is None:
+                continue
+            value = value._result_cache
+        elif hasattr(value, 'object_list'):
+            value = value.object_list
+        if isinstance(value, (list, tuple)):
+            ids.update(item.pk for item in value if isinstance(item, School))
+    return ids
+
+
+def _loader(context):
+    request = context.get('request')
+    if request is None:
+        return context.render_context.setdefault('_count_loader', CountLoader())
+    if not hasattr(request, '_count_loader'):
+        request._count_loader = CountLoader()
+    return request._count_loader
+
 # ----------------------------
 # Simple Tags
 # ----------------------------
 
-@register.simple_tag
-def school_count():
+@register.simple_tag(takes_context=True)
+def school_count(context):
     from theschool.models import School
-    return School.objects.count()
+    loader = _loader(context)
+    if loader.total_schools is None:
+        loader.total_schools = School.objects.count()
+    return loader.total_schools
 
-@register.simple_tag
-def student_count(school_id):
+@register.simple_tag(takes_context=True)
+def student_count(context, school_id):
     from theschool.models import Student
-    return Student.objects.filter(school_id=school_id).count()
+    if school_id is None:
+        return 0
+    return _loader(context).count(Student, int(school_id), context)
 
-@register.simple_tag
-def teacher_count(school_id):
+@register.simple_tag(takes_context=True)
+def teacher_count(context, school_id):
     from theschool.models import Teacher
-    return Teacher.objects.filter(school_id=school_id).count()
+    if school_id is None:
+        return 0
+    return _loader(context).count(Teacher, int(school_id), context)
+
+@register.simple_tag
+def css_bundle(*paths):
+    """
+    {% css_bundle 'css/sidebar.css' 'css/settings.css' %} -> one <link> to the
+    built bundle when STATIC_PIPELINE is on, otherwise one <link> per file.
+    Paths must be string literals: collectstatic finds bundles by reading templates.
+    """
+    if settings.STATIC_PIPELINE and len(paths) > 1:
+        from theschool.static_pipeline import bundle_name
+        return format_html('<link rel="stylesheet" href="{}">', static(bundle_name(paths)))
+    return format_html_join('\n', '<link rel="stylesheet" href="{}">', ((static(path),) for path in paths))
 
 # ----------------------------
 # Custom Filters
@@ -28,3 +109,9 @@ def teacher_count(school_id):
 @register.filter
 def dict_get(dictionary, key):
     return dictionary.get(key)
+
+@register.filter
+def thumbnail(photo, size='small'):
+    """{{ student.passport_photo|thumbnail:'small' }} -> URL of the resized variant."""
+    from theschool.image_utils import thumbnail_url
+    return thumbnail_url(photo, size)
@@ -1,3 +1,277 @@
-from django.test import TestCase
+import json
+import re
+import subprocess
+import sys
+import tempfile
+from datetime import date
+from pathlib import Path
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import IntegrityError, connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import (
+    School, Student, Attendance, User, Teacher, Stream, FeeRecord, LessonPlan,
+    MessageCampaign, OutboundMessage, SchoolFeeTotal, StudentFeeBalance, AttendanceDailySummary,
+)
+from .attendance_utils import rebuild_attendance_summary, save_register
+from .campaign_utils import DEFAULT_TEMPLATES, create_campaign, expand_campaign
+from .chatbot_utils import get_chatbot_reply
+from .fee_utils import rebuild_fee_ledger
+from .metrics_utils import ARCHIVE_NAME, MetricsRegistry, collect, query_signature, render_prometheus
+from .sms_utils import claim_batch, outbox_stats, queue_sms, release_stale_claims
+from .stats_utils import weekly_attendance_for_school
+
+# Tables that grow with enrolment and history; a full scan on any of them is a regression.
+HOT_TABLES = (
+    'theschool_attendance',
+    'theschool_attendancedailysummary',
+    'theschool_feerecord',
+    'theschool_student',
+    'theschool_lessonplan',
+    'theschool_outboundmessage',
+)
+FULL_SCAN = re.compile(r'\bSCAN (%s)\b' % '|'.join(HOT_TABLES))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class QueryPlanTests(TestCase):
+    """EXPLAIN QUERY PLAN every query the hot views run and reject full table scans."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # The requests pass through the metrics middleware; keep its files out of the real METRICS_DIR.
+        cls.enterClassContext(override_settings(METRICS_DIR=cls.enterClassContext(tempfile.TemporaryDirectory())))
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(name='Hill School', address='Nairobi')
+        cls.stream = Stream.objects.create(name='East', school=cls.school)
+        cls.admin = User.objects.create_user('head', password='pass', role='admin', school=cls.school)
+        cls.teacher = User.objects.create_user('teach', password='pass', role='teacher', school=cls.school)
+        cls.parent = User.objects.create_user('mum', password='pass', role='parent', school=cls.school)
+        cls.platform = User.objects.create_user(
+            'owner', password='pass', role='platform_admin', is_platform_admin=True
+        )
+        cls.student = Student.objects.create(
+            school=cls.school, first_name='Amani', last_name='Otieno',
+            stream=cls.stream, parent=cls.parent,
+        )
+        Teacher.objects.create(school=cls.school, first_name='Jane', last_name='Wanjiru')
+        Attendance.objects.create(student=cls.student, date=date.today(), status='Present')
+        FeeRecord.objects.create(student=cls.student, term='Term 1', amount_due=1000, amount_paid=400)
+        LessonPlan.objects.create(teacher=cls.teacher, title='Fractions', content='...')
+
+    def setUp(self):
+        # Views must run their real queries, not read last test's results from the cache.
+        cache.clear()
+
+    def assertNoFullScans(self, queries):
+        with connection.cursor() as cursor:
+            for query in queries:
+                sql = query['sql']
+                if not sql.lstrip().upper().startswith(('SELECT', 'UPDATE')):
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plan = '\n'.join(row[-1] for row in cursor.fetchall())
+                self.assertIsNone(FULL_SCAN.search(plan), f"Full table scan:\n{sql}\n{plan}")
+
+    def assertViewUsesIndexes(self, user, url, params=None):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertNoFullScans(ctx.captured_queries)
+
+    def test_admin_dashboard(self):
+        self.assertViewUsesIndexes(self.admin, reverse('dashboard'))
+
+    def test_dashboard_panels(self):
+        for panel in ('counts', 'attendance', 'gender', 'fees'):
+            url = reverse('dashboard_panel_data', args=[panel])
+            self.assertViewUsesIndexes(self.admin, url)
+            etag = self.client.get(url)['ETag']
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(len(ctx.captured_queries), 2)  # session and user only
+
+    def test_manage_students(self):
+        self.assertViewUsesIndexes(self.admin, reverse('manage_students'))
+
+    def test_teacher_dashboard(self):
+        self.assertViewUsesIndexes(self.teacher, reverse('teacher_dashboard'))
+
+    def test_class_register(self):
+        self.assertViewUsesIndexes(
+            self.teacher, reverse('record_register'),
+            {'stream': self.stream.id, 'date': date.today().isoformat()},
+        )
+
+    def test_parent_dashboard(self):
+        self.assertViewUsesIndexes(self.parent, reverse('parent_dashboard'))
+
+    def test_view_school(self):
+        self.assertViewUsesIndexes(self.platform, reverse('view_school', args=[self.school.id]))
+
+    def test_weekly_attendance(self):
+        with CaptureQueriesContext(connection) as ctx:
+            weekly_attendance_for_school(self.school)
+        self.assertNoFullScans(ctx.captured_queries)
+
+    def test_outbox_worker(self):
+        queue_sms('0700000000', 'Fee reminder', school=self.school)
+        with CaptureQueriesContext(connection) as ctx:
+            release_stale_claims()
+            claim_batch()
+            outbox_stats()
+        self.assertNoFullScans(ctx.captured_queries)
+
+    def test_campaign_expansion(self):
+        with CaptureQueriesContext(connection) as ctx:
+            campaign = create_campaign(self.school, 'fee_reminder', DEFAULT_TEMPLATES['fee_reminder'])
+            expand_campaign(campaign)
+        self.assertNoFullScans(ctx.captured_queries)
+
+    def test_campaign_batch_is_queued_once(self):
+        # Two workers holding the same campaign read the same first batch.
+        User.objects.filter(pk=self.parent.pk).update(phone_number='0700000000')
+        campaign = create_campaign(self.school, 'all_parents', 'Dear parent')
+        stale = MessageCampaign.objects.get(pk=campaign.pk)
+        self.assertEqual(expand_campaign(campaign, batch_size=1), 1)
+        self.assertEqual(expand_campaign(stale, batch_size=1), 0)
+        self.assertEqual(OutboundMessage.objects.filter(campaign=campaign).count(), 1)
+        stale.refresh_from_db()
+        self.assertEqual(stale.queued, 1)
+
+    def test_chatbot_balance(self):
+        with CaptureQueriesContext(connection) as ctx:
+            get_chatbot_reply(f'balance {self.student.registration_number.lower()}', self.admin)
+        self.assertNoFullScans(ctx.captured_queries)
+
+    def test_people_search(self):
+        self.assertViewUsesIndexes(self.admin, reverse('search_people'), {'q': 'amani ot'})
+        self.assertViewUsesIndexes(self.admin, reverse('search_people'), {'q': 'amnai'})
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class DerivedTableTests(TestCase):
+    """The tables the signals keep in step must match a rebuild from the raw rows."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(name='Hill School', address='Nairobi')
+        cls.other_school = School.objects.create(name='Lake School', address='Kisumu')
+        cls.stream = Stream.objects.create(name='East', school=cls.school)
+        cls.other_stream = Stream.objects.create(name='West', school=cls.other_school)
+        cls.student = Student.objects.create(
+            school=cls.school, first_name='Amani', last_name='Otieno', stream=cls.stream,
+        )
+        cls.classmate = Student.objects.create(
+            school=cls.school, first_name='Pendo', last_name='Mwangi', stream=cls.stream,
+        )
+        FeeRecord.objects.create(student=cls.student, term='Term 1', amount_due=1000, amount_paid=400)
+        FeeRecord.objects.create(student=cls.classmate, term='Term 1', amount_due=1000, amount_paid=1000)
+        cls.day = date(2024, 3, 4)
+        cls.attendance = Attendance.objects.create(student=cls.student, date=cls.day, status='Present')
+        Attendance.objects.create(student=cls.classmate, date=cls.day, status='Absent')
+        Attendance.objects.create(student=cls.student, date=date(2024, 3, 5), status='Absent')
+
+    def rollup(self):
+        return {
+            row[:3]: row[3:]
+            for row in AttendanceDailySummary.objects.values_list('school_id', 'stream_id', 'date', 'present', 'total')
+            if row[4]
+        }
+
+    def ledger(self):
+        # Rows the signals emptied are equivalent to missing ones.
+        return (
+            {row[0]: row[1:] for row in StudentFeeBalance.objects.values_list('student_id', 'total_due', 'total_paid')
+             if any(row[1:])},
+            {row[:2]: row[2:] for row in SchoolFeeTotal.objects.values_list('school_id', 'term', 'total_due', 'total_paid')
+             if any(row[2:])},
+        )
+
+    def assertMatchesRebuild(self):
+        rollup, ledger = self.rollup(), self.ledger()
+        rebuild_attendance_summary()
+        rebuild_fee_ledger()
+        self.assertEqual(rollup, self.rollup())
+        self.assertEqual(ledger, self.ledger())
+
+    def test_attendance_edit(self):
+        self.attendance.status = 'Absent'
+        self.attendance.save()
+        self.attendance.delete()
+        self.assertMatchesRebuild()
+
+    def test_register_save(self):
+        save_register(self.school, self.day, {self.student.pk: 'Absent', self.classmate.pk: 'Present'})
+        save_register(self.school, date(2024, 3, 6), {self.student.pk: 'Present'}, stream=self.stream)
+        self.assertMatchesRebuild()
+
+    def test_stream_move(self):
+        self.student.stream = Stream.objects.create(name='West', school=self.school)
+        self.student.save()
+        self.assertMatchesRebuild()
+
+    def test_transfer(self):
+        self.student.school, self.student.stream = self.other_school, self.other_stream
+        self.student.save()
+        self.assertMatchesRebuild()
+
+    def test_student_delete(self):
+        self.student.delete()
+        self.assertMatchesRebuild()
+
+    def test_failed_transfer(self):
+        self.student.school, self.student.stream = self.other_school, self.other_stream
+        self.student.registration_number = self.classmate.registration_number
+        with self.assertRaises(IntegrityError):
+            self.student.save()
+        self.assertMatchesRebuild()
+
+
+class MetricsTests(SimpleTestCase):
+    """The /metrics text must stay parseable by Prometheus scrapers and its counters must never go backwards."""
+
+    def test_render_prometheus(self):
+        registry = MetricsRegistry()
+        registry.inc('theschool_http_requests_total', {'view': 'dashboard', 'method': 'GET', 'status': '200'}, 3)
+        registry.observe('theschool_http_request_queries', {'view': 'say "hi"'}, 4, (1, 5))
+        self.assertEqual(render_prometheus(registry.samples), '\n'.join([
+            '# HELP theschool_http_request_queries SQL queries per request.',
+            '# TYPE theschool_http_request_queries histogram',
+            'theschool_http_request_queries_bucket{le="1",view="say \\"hi\\""} 0',
+            'theschool_http_request_queries_bucket{le="5",view="say \\"hi\\""} 1',
+            'theschool_http_request_queries_bucket{le="+Inf",view="say \\"hi\\""} 1',
+            'theschool_http_request_queries_count{view="say \\"hi\\""} 1',
+            'theschool_http_request_queries_sum{view="say \\"hi\\""} 4',
+            '# HELP theschool_http_requests_total Requests served, by view, method and status code.',
+            '# TYPE theschool_http_requests_total counter',
+            'theschool_http_requests_total{method="GET",status="200",view="dashboard"} 3',
+        ]) + '\n')
+
+    def test_query_signature_ignores_in_list_length(self):
+        one = 'SELECT * FROM "theschool_student" WHERE "id" IN (%s)'
+        self.assertEqual(query_signature(one), query_signature(one.replace('(%s)', '(%s, %s, %s)')))
+        self.assertNotEqual(query_signature(one), query_signature(one.replace('"id"', '"stream_id"')))
+
+    def test_collect_folds_exited_processes(self):
+        exited = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'],
+                                capture_output=True, text=True, check=True)
+        sample = [['theschool_http_requests_total', {'view': 'exited', 'method': 'GET', 'status': '200'}, 2]]
+        key = ('theschool_http_requests_total', (('method', 'GET'), ('status', '200'), ('view', 'exited')))
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            for n in range(2):
+                # Two workers that have since exited, the second reusing the first one's pid.
+                Path(directory, f'metrics-{exited.stdout.strip()}-{n}a.json').write_text(json.dumps(sample))
+            self.assertEqual(collect()[key], 4)
+            self.assertEqual(collect()[key], 4)
+            files = sorted(path.name for path in Path(directory).glob('metrics-*.json'))
+            self.assertEqual(len(files), 2)  # the archive and this process's own file
+            self.assertIn(ARCHIVE_NAME, files)
@@ -10,6 +10,7 @@ urlpatterns = [
 
     # Dashboards
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('dashboard/panels/<str:panel>/', views.dashboard_panel_data, name='dashboard_panel_data'),
     path('teacher/', views.teacher_dashboard, name='teacher_dashboard'),
     path('parent/', views.parent_dashboard, name='parent_dashboard'),
     path('platform/', views.platform_dashboard, name='platform_dashboard'),
@@ -23,9 +24,12 @@ urlpatterns = [
     # Students
     path('manage_students/', views.manage_students, name='manage_students'),
     path('add_student/', views.add_student, name='add_student'),
+    path('import_students/', views.import_students_view, name='import_students'),
     path('student/<int:student_id>/', views.view_student, name='view_student'),
     path('student/<int:student_id>/edit/', views.edit_student, name='edit_student'),
     path('student/<int:student_id>/delete/', views.delete_student, name='delete_student'),
+    path('export/<str:dataset>/', views.export_data, name='export_data'),
+    path('search/', views.search_people, name='search_people'),
 
 
     # Teachers
@@ -51,8 +55,12 @@ urlpatterns = [
 
     # Teacher Actions
     path('record_attendance/', views.record_attendance, name='record_attendance'),
+    path('record_attendance/register/', views.record_register, name='record_register'),
 
     # Chatbot
       path("admin/dashboard/", views.dashboard, name="admin_dashboard"),
     path("admin/chatbot-reply/", views.chatbot_reply, name="chatbot_reply"),
+
+    # Monitoring
+    path('metrics', views.metrics, name='metrics'),
 ]
@@ -1,4 +1,5 @@
 # utils.py
-def send_sms(phone_number, message):
-    # Placeholder for integration with Twilio or Africa's Talking
-    print(f"Sending SMS to {phone_number}: {message}")
+def send_sms(phone_number, message, school=None):
+    # Queues the message; `manage.py send_outbox` delivers it through settings.SMS_BACKEND
+    from .sms_utils import queue_sms
+    return queue_sms(phone_number, message, school=school)
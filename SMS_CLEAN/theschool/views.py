@@ -1,25 +1,48 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.contrib.auth.decorators import login_required
-from django.db.models import Sum
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.db import transaction
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.http import require_POST
-from django.http import JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_POST
+from django.http import (
+    Http404, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, JsonResponse, StreamingHttpResponse,
+)
+from django.urls import reverse
 from .models import Student, Teacher
 from .ai_utils import generate_insight
 from .chatbot_utils import get_chatbot_reply
-from .stats_utils import weekly_attendance_for_school
+from .attendance_utils import save_register
+from .cache_utils import cached_for_school, school_version
+from .campaign_utils import (
+    DEFAULT_TEMPLATES, PLACEHOLDERS, cancel_campaign, create_campaign, with_progress,
+)
+from .export_utils import FORMATS as EXPORT_FORMATS, parse_bound, stream_export
+from .import_utils import import_students
+from .list_utils import paginate_keyset
+from .metrics_utils import collect, render_prometheus, scraper_allowed
+from .replica_utils import analytics_db, use_analytics
+from .search_utils import search
+from .stats_utils import (
+    DASHBOARD_PANELS, annotate_school_kpis, dashboard_panel, platform_totals, school_kpi_rows,
+    school_stats_snapshot,
+)
 
 
 from .models import (
-    School, Student, Attendance, User, Teacher, SupportStaff,
-    Stream, FeeRecord, LessonPlan, PlatformConfig,ParentDetails,GuardianDetails
+    School, Student, Attendance, AttendanceDailySummary, User, Teacher, SupportStaff,
+    Stream, FeeRecord, LessonPlan, PlatformConfig,ParentDetails,GuardianDetails,
+    StudentFeeBalance, MessageCampaign,
 )
 from .utils import send_sms
 
+GRADES = ["Grade 1", "Grade 2", "Grade 3", "Grade 4", "Grade 5", "Grade 6"]
+
 # ----------------------------
 # Authentication
 # ----------------------------
@@ -63,35 +86,33 @@ def logout_view(request):
 # Dashboards
 # ----------------------------
 
-def get_attendance_percent(school, weekday_name):
-    today = timezone.now()
-    weekday_map = {'Monday': 0, 'Tuesday': 1, 'Wednesday': 2, 'Thursday': 3, 'Friday': 4}
-    target_day = weekday_map.get(weekday_name)
-    if target_day is None:
-        return 0
-    target_date = today - timezone.timedelta(days=today.weekday()) + timezone.timedelta(days=target_day)
-    records = Attendance.objects.filter(student__school=school, date=target_date)
-    total = records.count()
-    present = records.filter(status='Present').count()
-    return round((present / total) * 100, 2) if total > 0 else 0
-
 @login_required
 def dashboard(request):
-    user = request.user
-    context = {
-        'total_students': Student.objects.filter(school=user.school).count(),
-        'total_teachers': Teacher.objects.filter(school=user.school).count(),
-        'total_staff': SupportStaff.objects.filter(school=user.school).count(),
-        'total_streams': Stream.objects.filter(school=user.school).count(),
-        'boys_count': Student.objects.filter(school=user.school, gender='Male').count(),
-        'girls_count': Student.objects.filter(school=user.school, gender='Female').count(),
-        'mon_attendance': get_attendance_percent(user.school, 'Monday'),
-        'tue_attendance': get_attendance_percent(user.school, 'Tuesday'),
-        'wed_attendance': get_attendance_percent(user.school, 'Wednesday'),
-        'thu_attendance': get_attendance_percent(user.school, 'Thursday'),
-        'fri_attendance': get_attendance_percent(user.school, 'Friday'),
-    }
-    return render(request, 'admin_dashboard.html', context)
+    # The page is a shell; its numbers and charts load from dashboard_panel_data.
+    return render(request, 'admin_dashboard.html')
+
+
+def _panel_etag(request, panel):
+    school_id = request.user.school_id
+    if school_id is None or panel not in DASHBOARD_PANELS:
+        return None
+    # Any write to the school replaces its cache version; the date rolls the week over.
+    return f"{school_version(school_id)}-{panel}-{timezone.localdate().isoformat()}"
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_panel_etag)
+def dashboard_panel_data(request, panel):
+    """
+    JSON for one dashboard panel (counts, attendance, gender, fees) of the
+    user's school, for every user the dashboard page is shown to (zeros
+    without a school). Browsers revalidate with If-None-Match and get a 304
+    until the school's data changes, which costs one cache read.
+    """
+    if panel not in DASHBOARD_PANELS:
+        raise Http404("Unknown dashboard panel")
+    return JsonResponse(dashboard_panel(request.user.school, panel))
 
 @login_required
 def teacher_dashboard(request):
@@ -111,38 +132,39 @@ def parent_dashboard(request):
     if request.user.role != 'parent':
         return redirect('dashboard')
     student = Student.objects.filter(parent=request.user).first()
-    fee = FeeRecord.objects.filter(student=student).last()
-    attendance = Attendance.objects.filter(student=student).order_by('-date')[:10]
+    if student is None:
+        return render(request, 'parent_dashboard.html', {'student': None})
+
+    def child_records():
+        return {
+            'fee': FeeRecord.objects.filter(student=student).last(),
+            'balance': StudentFeeBalance.objects.filter(student=student).first(),
+            'attendance': list(Attendance.objects.filter(student=student).order_by('-date')[:10]),
+        }
+
     return render(request, 'parent_dashboard.html', {
         'student': student,
-        'fee': fee,
-        'attendance': attendance
+        **cached_for_school(student.school_id, f'parent:{student.pk}', child_records),
     })
 
 @login_required
+@use_analytics
 def platform_dashboard(request):
     if not request.user.is_platform_admin:
         return redirect('dashboard')
 
-    schools = School.objects.all()
-    total_students = Student.objects.count()
-    total_teachers = User.objects.filter(role='teacher').count()
-
-    paid = FeeRecord.objects.aggregate(total=Sum('amount_paid'))['total'] or 0
-    due = FeeRecord.objects.aggregate(total=Sum('amount_due'))['total'] or 1
-    fee_compliance = round((paid / due) * 100, 2)
-
-    school_admins = {
-        school.id: school.user_set.filter(role='admin').first()
-        for school in schools
-    }
+    schools = paginate_keyset(
+        request,
+        annotate_school_kpis(School.objects.all()),
+        sorts={'name': 'name', 'created': 'created_at'},
+        default_sort='name',
+        page_size=25,
+    )
+    school_kpi_rows(schools)
 
     return render(request, 'platform_dashboard.html', {
         'schools': schools,
-        'total_students': total_students,
-        'total_teachers': total_teachers,
-        'fee_compliance': fee_compliance,
-        'school_admins': school_admins
+        **platform_totals(),
     })
 
 # ----------------------------
@@ -179,24 +201,35 @@ def register_school(request):
     return render(request, 'register_school.html')
 
 @login_required
+@use_analytics
 def view_school(request, school_id):
     school = get_object_or_404(School, id=school_id)
     admin = school.user_set.filter(role='admin').first()
-    students = Student.objects.filter(school=school)
-    student_count = students.count()
-
-    paid = FeeRecord.objects.filter(student__in=students).aggregate(total=Sum('amount_paid'))['total'] or 0
-    due = FeeRecord.objects.filter(student__in=students).aggregate(total=Sum('amount_due'))['total'] or 1
-    fee_compliance = round((paid / due) * 100, 2)
-
-    recent_attendance = Attendance.objects.filter(student__in=students).order_by('-date')[:5]
+    stats = school_stats_snapshot(school)
+
+    def recent_attendance():
+        # The last five rollup rows hold at least five records, so their earliest
+        # date bounds the scan instead of sorting the school's whole history.
+        recent_days = list(
+            AttendanceDailySummary.objects.filter(school=school, total__gt=0)
+            .order_by('-date')
+            .values_list('date', flat=True)[:5]
+        )
+        if not recent_days:
+            return []
+        return list(
+            Attendance.objects.filter(student__school=school, date__gte=min(recent_days))
+            .select_related('student')
+            .order_by('-date')[:5]
+        )
 
     return render(request, 'view_school.html', {
         'school': school,
         'admin': admin,
-        'student_count': student_count,
-        'fee_compliance': fee_compliance,
-        'recent_attendance': recent_attendance
+        'student_count': stats['total_students'],
+        'fee_compliance': stats['fee_compliance'],
+        'weekly_attendance': stats['weekly_attendance_avg'],
+        'recent_attendance': cached_for_school(school.pk, 'recent_attendance', recent_attendance),
     })
 
 @login_required
@@ -272,14 +305,71 @@ def manage_users_view(request):
     if not request.user.is_platform_admin:
         return redirect('dashboard')
 
-    users = User.objects.all()
-    return render(request, 'manage_users.html', {'users': users})
+    users = paginate_keyset(
+        request,
+        User.objects.select_related('school').only('id', 'username', 'role', 'school__name'),
+        sorts={'username': 'username', 'role': 'role'},
+        default_sort='username',
+        filters={'role': 'role', 'school': 'school_id'},
+    )
+    return render(request, 'manage_users.html', {
+        'users': users,
+        'roles': User.ROLE_CHOICES,
+        'schools': School.objects.order_by('name').only('id', 'name'),
+    })
 
 @login_required
 def announcements_view(request):
-    if not request.user.is_platform_admin:
+    """Bulk SMS campaigns: platform admins may target any school, school admins their own."""
+    platform = request.user.is_platform_admin
+    if not platform and request.user.role != 'admin':
         return redirect('dashboard')
-    return render(request, 'announcements.html')
+
+    campaigns = MessageCampaign.objects.select_related('school').order_by('-created_at')
+    if not platform:
+        campaigns = campaigns.filter(school=request.user.school)
+
+    error = None
+    if request.method == 'POST':
+        if request.POST.get('action') == 'cancel':
+            campaign_id = request.POST.get('campaign_id') or ''
+            if not campaign_id.isdigit():
+                return HttpResponseBadRequest("No campaign to cancel.")
+            campaign = get_object_or_404(campaigns, id=campaign_id)
+            cancel_campaign(campaign)
+            return redirect('announcements')
+
+        school = request.user.school
+        if platform:
+            school_id = request.POST.get('school') or ''
+            if school_id and not school_id.isdigit():
+                return HttpResponseBadRequest("Unknown school.")
+            school = get_object_or_404(School, id=school_id) if school_id else None
+        try:
+            create_campaign(
+                school,
+                request.POST.get('audience', ''),
+                request.POST.get('template', ''),
+                created_by=request.user,
+                rate_per_minute=int(request.POST.get('rate_per_minute') or 600),
+            )
+            return redirect('announcements')
+        except ValueError as exc:
+            error = str(exc)
+
+    audience = request.POST.get('audience') or request.GET.get('audience') or 'fee_reminder'
+    if audience not in DEFAULT_TEMPLATES:
+        audience = 'fee_reminder'
+    return render(request, 'announcements.html', {
+        'campaigns': with_progress(campaigns)[:20],
+        'audiences': MessageCampaign.AUDIENCE_CHOICES,
+        'audience': audience,
+        'template': request.POST.get('template') or DEFAULT_TEMPLATES[audience],
+        'default_templates': DEFAULT_TEMPLATES,
+        'placeholders': PLACEHOLDERS,
+        'schools': School.objects.order_by('name').only('id', 'name') if platform else None,
+        'error': error,
+    })
 
 # ----------------------------
 # Student Management
@@ -340,13 +430,95 @@ def add_student(request):
 
     return render(request, 'school_admin/add_student.html')
 
+@login_required
+def import_students_view(request):
+    if request.user.role != 'admin':
+        return redirect('dashboard')
+
+    if request.method == 'POST' and request.FILES.get('roster'):
+        roster = request.FILES['roster']
+        try:
+            report = import_students(request.user.school, roster.file, roster.name)
+        except Exception as e:
+            return render(request, 'school_admin/import_students.html', {
+                'error': f"Failed to import students: {str(e)}"
+            })
+        return render(request, 'school_admin/import_students.html', {'report': report})
+
+    return render(request, 'school_admin/import_students.html')
+
 @login_required
 def manage_students(request):
     if request.user.role != 'admin':
         return redirect('dashboard')
 
-    students = Student.objects.filter(school=request.user.school).select_related('stream')
-    return render(request, 'school_admin/manage_students.html', {'students': students})
+    students = paginate_keyset(
+        request,
+        Student.objects.filter(school=request.user.school).select_related('stream').only(
+            'id', 'first_name', 'last_name', 'grade', 'registration_number', 'passport_photo', 'stream__name'
+        ),
+        sorts={'name': 'last_name', 'reg': 'registration_number', 'grade': 'grade'},
+        default_sort='name',
+        filters={'grade': 'grade', 'stream': 'stream_id', 'gender': 'gender'},
+    )
+    return render(request, 'school_admin/manage_students.html', {
+        'students': students,
+        'grades': GRADES,
+        'genders': Student.GENDER_CHOICES,
+        'streams': Stream.objects.filter(school=request.user.school).order_by('name'),
+    })
+
+@login_required
+def export_data(request, dataset):
+    """Stream students, attendance or fee records as CSV or JSONL."""
+    if request.user.is_platform_admin:
+        school_id = request.GET.get('school') or ''
+        if not school_id.isdigit():
+            return HttpResponseBadRequest("Pick a school to export.")
+        school = get_object_or_404(School, id=school_id)
+    elif request.user.role == 'admin':
+        school = request.user.school
+    else:
+        return redirect('dashboard')
+
+    fmt = request.GET.get('format', 'csv')
+    try:
+        start = parse_bound(request.GET.get('start'), 'start')
+        end = parse_bound(request.GET.get('end'), 'end')
+        lines = stream_export(dataset, school, start=start, end=end, fmt=fmt, using=analytics_db(request))
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    response = StreamingHttpResponse(lines, content_type=EXPORT_FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{dataset}-{school.id}.{fmt}"'
+    return response
+
+SEARCH_RESULT_URLS = {'student': 'view_student', 'teacher': 'view_teacher', 'staff': 'view_staff'}
+
+
+@login_required
+def search_people(request):
+    """Type-ahead JSON: ranked students, teachers and staff matching ?q=."""
+    if request.user.is_platform_admin:
+        school_id = request.GET.get('school') or None
+    elif request.user.role == 'admin':
+        school_id = request.user.school_id
+    else:
+        return JsonResponse({'results': []}, status=403)
+
+    kinds = [kind for kind in request.GET.getlist('kind') if kind in SEARCH_RESULT_URLS]
+    try:
+        results = search(school_id and int(school_id), request.GET.get('q', ''), kinds=kinds)
+    except ValueError:
+        return JsonResponse({'results': []}, status=400)
+    for result in results:
+        # The person pages are scoped to the admin's own school; a platform
+        # admin is sent to the person's school instead.
+        if request.user.is_platform_admin:
+            result['url'] = reverse('view_school', args=[result['school_id']])
+        else:
+            result['url'] = reverse(SEARCH_RESULT_URLS[result['kind']], args=[result['id']])
+    return JsonResponse({'results': results})
 
 # ----------------------------
 # Teacher Actions
@@ -358,16 +530,61 @@ def record_attendance(request):
         return redirect('dashboard')
 
     if request.method == 'POST':
-        Attendance.objects.create(
+        Attendance.objects.update_or_create(
             student_id=request.POST['student_id'],
             date=request.POST['date'],
-            status=request.POST['status']
+            defaults={'status': request.POST['status']}
         )
         return redirect('teacher_dashboard')
 
     students = Student.objects.filter(school=request.user.school)
     return render(request, 'attendance_form.html', {'students': students})
 
+@login_required
+def record_register(request):
+    """Take a whole stream's register in one submission."""
+    if request.user.role != 'teacher':
+        return redirect('dashboard')
+
+    school = request.user.school
+    streams = Stream.objects.filter(school=school).order_by('name')
+    data = request.POST if request.method == 'POST' else request.GET
+    stream_id = data.get('stream') or ''
+    stream = streams.filter(id=stream_id).first() if stream_id.isdigit() else None
+    try:
+        day = parse_date(data.get('date') or '') or timezone.localdate()
+    except ValueError:
+        return HttpResponseBadRequest("Invalid date.")
+
+    if request.method == 'POST' and stream:
+        valid = {choice for choice, _ in Attendance.STATUS_CHOICES}
+        statuses = {}
+        for key, value in request.POST.items():
+            if key.startswith('status_') and value in valid and key[7:].isdigit():
+                statuses[int(key[7:])] = value
+        save_register(school, day, statuses, stream=stream)
+        return redirect('teacher_dashboard')
+
+    students = []
+    if stream:
+        recorded = dict(
+            Attendance.objects.filter(student__stream=stream, date=day).values_list('student_id', 'status')
+        )
+        students = list(
+            Student.objects.filter(school=school, stream=stream)
+            .order_by('last_name', 'first_name')
+            .only('id', 'first_name', 'last_name', 'registration_number')
+        )
+        for student in students:
+            student.status = recorded.get(student.id, 'Present')
+
+    return render(request, 'attendance_register.html', {
+        'streams': streams,
+        'stream': stream,
+        'date': day,
+        'students': students,
+    })
+
 # ----------------------------
 # Admin Actions
 # ----------------------------
@@ -379,13 +596,15 @@ def record_fee(request):
 
     if request.method == 'POST':
         student = get_object_or_404(Student, id=request.POST['student_id'])
-        FeeRecord.objects.create(
-            student=student,
-            term=request.POST['term'],
-            amount_due=request.POST['amount_due'],
-            amount_paid=request.POST['amount_paid']
-        )
-        notify_parent_fee(student.id)
+        # The reminder is an outbox row, so it commits (or not) with the fee record.
+        with transaction.atomic():
+            FeeRecord.objects.create(
+                student=student,
+                term=request.POST['term'],
+                amount_due=request.POST['amount_due'],
+                amount_paid=request.POST['amount_paid']
+            )
+            notify_parent_fee(student.id)
 
     return redirect('dashboard')
 
@@ -403,13 +622,20 @@ def notify_parent_fee(student_id):
             f"Reminder: {student.first_name} {student.last_name}'s fee for {fee.term} "
             f"is KES {fee.amount_due}. Paid: KES {fee.amount_paid}."
         )
-        send_sms(parent.phone_number, message)
+        send_sms(parent.phone_number, message, school=student.school_id)
 
 @login_required
 def manage_teachers(request):
     if request.user.role != 'admin':
         return redirect('dashboard')
-    teachers = Teacher.objects.filter(school=request.user.school)
+    teachers = paginate_keyset(
+        request,
+        Teacher.objects.filter(school=request.user.school).only(
+            'id', 'first_name', 'last_name', 'teacher_id', 'subjects', 'profile_photo'
+        ),
+        sorts={'name': 'last_name', 'id': 'teacher_id'},
+        default_sort='name',
+    )
     return render(request, 'school_admin/manage_teachers.html', {'teachers': teachers})
 
 @login_required
@@ -426,7 +652,10 @@ def add_teacher(request):
         )
         if request.FILES.get('profile_photo'):
             teacher.profile_photo = request.FILES.get('profile_photo')
-        teacher.save()
+        try:
+            teacher.save()
+        except ValidationError as exc:
+            return render(request, 'school_admin/add_teacher.html', {'error': exc.messages[0]})
         return redirect('manage_teachers')
     return render(request, 'school_admin/add_teacher.html')
 
@@ -442,7 +671,10 @@ def edit_teacher(request, teacher_id):
         teacher.subjects = request.POST.get('subjects')
         if request.FILES.get('profile_photo'):
             teacher.profile_photo = request.FILES.get('profile_photo')
-        teacher.save()
+        try:
+            teacher.save()
+        except ValidationError as exc:
+            return render(request, 'school_admin/edit_teacher.html', {'teacher': teacher, 'error': exc.messages[0]})
         return redirect('manage_teachers')
     return render(request, 'school_admin/edit_teacher.html', {'teacher': teacher})
 
@@ -465,7 +697,15 @@ def delete_teacher(request, teacher_id):
 def manage_staff(request):
     if request.user.role != 'admin':
         return redirect('dashboard')
-    staff = SupportStaff.objects.filter(school=request.user.school)
+    staff = paginate_keyset(
+        request,
+        SupportStaff.objects.filter(school=request.user.school).only(
+            'id', 'name', 'working_id', 'role', 'profile_photo'
+        ),
+        sorts={'name': 'name', 'role': 'role'},
+        default_sort='name',
+        filters={'role': 'role'},
+    )
     return render(request, 'school_admin/manage_support_staff.html', {'staff': staff})
 
 @login_required
@@ -479,21 +719,18 @@ def add_staff(request):
         national_id = request.POST.get('national_id')
         profile_photo = request.FILES.get('profile_photo')
 
-        # Generate working ID
-        initials = ''.join([part[0] for part in name.split() if part])[:2].upper()
-        count = SupportStaff.objects.filter(school=request.user.school).count() + 1
-        school_id = f"{request.user.school.id:03d}"
-        working_id = f"S{initials}{school_id}{count:04d}"
-
+        # Working ID is generated on save
         member = SupportStaff(
             school=request.user.school,
             name=name,
             role=role,
             national_id=national_id,
-            working_id=working_id,
             profile_photo=profile_photo
         )
-        member.save()
+        try:
+            member.save()
+        except ValidationError as exc:
+            return render(request, 'school_admin/add_support_staff.html', {'error': exc.messages[0]})
         return redirect('manage_staff')
 
     return render(request, 'school_admin/add_support_staff.html')
@@ -509,7 +746,10 @@ def edit_staff(request, staff_id):
         staff.national_id = request.POST.get('national_id')
         if request.FILES.get('profile_photo'):
             staff.profile_photo = request.FILES.get('profile_photo')
-        staff.save()
+        try:
+            staff.save()
+        except ValidationError as exc:
+            return render(request, 'school_admin/edit_support_staff.html', {'staff': staff, 'error': exc.messages[0]})
         return redirect('manage_staff')
     return render(request, 'school_admin/edit_support_staff.html', {'staff': staff})
 
@@ -543,7 +783,7 @@ def edit_student(request, student_id):
         return redirect('dashboard')
 
     student = get_object_or_404(Student, id=student_id, school=request.user.school)
-    grades = ["Grade 1", "Grade 2", "Grade 3", "Grade 4", "Grade 5", "Grade 6"]
+    grades = GRADES
 
     if request.method == 'POST':
         student.first_name = request.POST.get('first_name')
@@ -560,7 +800,14 @@ def edit_student(request, student_id):
         if request.FILES.get('passport_photo'):
             student.passport_photo = request.FILES.get('passport_photo')
 
-        student.save()
+        try:
+            student.save()
+        except ValidationError as exc:
+            return render(request, 'school_admin/edit_student.html', {
+                'student': student,
+                'grades': grades,
+                'error': exc.messages[0],
+            })
         return redirect('manage_students')
 
     return render(request, 'school_admin/edit_student.html', {
@@ -586,53 +833,21 @@ def delete_student(request, student_id):
 def admin_dashboard(request):
     # restrict to only school admins in your app if you have that flag
     school = getattr(request.user, "school", None)
-
-    # counts (defensive)
-    try:
-        total_students = Student.objects.filter(school=school).count()
-    except Exception:
-        total_students = Student.objects.count()
-
-    try:
-        total_teachers = Teacher.objects.filter(school=school).count()
-    except Exception:
-        total_teachers = Teacher.objects.count()
-
-    # gender counts (try common field names)
-    try:
-        boys_count = Student.objects.filter(school=school, gender__iexact="M").count()
-        girls_count = Student.objects.filter(school=school, gender__iexact="F").count()
-    except Exception:
-        boys_count = 0
-        girls_count = 0
-
-    # attendance stats
-    att_stats = weekly_attendance_for_school(school)
+    stats = school_stats_snapshot(school)
 
     # create ai insight
     stats_for_ai = {
-        "total_students": total_students,
-        "total_teachers": total_teachers,
-        "boys": boys_count,
-        "girls": girls_count,
-        **att_stats
+        "total_students": stats["total_students"],
+        "total_teachers": stats["total_teachers"],
+        "boys": stats["boys_count"],
+        "girls": stats["girls_count"],
+        "weekly_attendance_avg": stats["weekly_attendance_avg"],
+        "fee_collection_rate": stats["fee_compliance"],
+        **{day: stats[f"{day}_attendance"] for day in ("mon", "tue", "wed", "thu", "fri")},
     }
     ai = generate_insight(stats_for_ai)
-    ai_message = ai["message"]
-
-    context = {
-        "total_students": total_students,
-        "total_teachers": total_teachers,
-        "boys_count": boys_count,
-        "girls_count": girls_count,
-        "mon_attendance": att_stats.get("mon", 0),
-        "tue_attendance": att_stats.get("tue", 0),
-        "wed_attendance": att_stats.get("wed", 0),
-        "thu_attendance": att_stats.get("thu", 0),
-        "fri_attendance": att_stats.get("fri", 0),
-        "weekly_attendance_avg": att_stats.get("weekly_attendance_avg", 0),
-        "ai_message": ai_message,
-    }
+
+    context = {**stats, "ai_message": ai["message"], "ai_actions": ai["actions"]}
     return render(request, "admin_dashboard.html", context)
 
 
@@ -643,3 +858,13 @@ def chatbot_reply(request):
     message = request.POST.get("message", "")
     reply = get_chatbot_reply(message, request.user)
     return JsonResponse({"reply": reply})
+
+
+def metrics(request):
+    """Request metrics of every worker process in Prometheus text format, for scrapers and platform admins."""
+    allowed = scraper_allowed(request) or (
+        request.user.is_authenticated and request.user.is_platform_admin
+    )
+    if not allowed:
+        return HttpResponseForbidden("Metrics are only available to scrapers and platform admins.")
+    return HttpResponse(render_prometheus(collect()), content_type='text/plain; version=0.0.4; charset=utf-8')